@@ -1,34 +1,70 @@
 import os
+import io
+import csv
+import atexit
+import queue
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import sys
+import time
 import json
+import html
+import asyncio
 import random
-from datetime import datetime, timedelta
+import threading
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+from types import MappingProxyType
 from dotenv import load_dotenv
 import sqlite3
 from sqlite3 import Error
+from cachetools import TTLCache
+from aiolimiter import AsyncLimiter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove, InputMediaPhoto
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, JobQueue, MessageHandler, filters, ConversationHandler
-from telegram.error import InvalidToken
+from telegram.ext import AIORateLimiter, Application, CommandHandler, CallbackQueryHandler, ContextTypes, Defaults, JobQueue, MessageHandler, filters, ConversationHandler
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, InvalidToken, TelegramError
+from telegram.request import HTTPXRequest
 from pathlib import Path
 
 # Load environment variables
 load_dotenv()
 
 # Admin user IDs loaded from environment variables
-ADMIN_IDS = [int(id.strip()) for id in os.getenv('ADMIN_IDS', '982793851').split(',')]
-
-# Enable logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler('bot_detailed.log'),
-        logging.StreamHandler()
-    ]
-)
+ADMIN_IDS = frozenset(int(id.strip()) for id in os.getenv('ADMIN_IDS', '982793851').split(','))
+
+# Enable logging. Records are handed to a background thread through a queue so
+# handlers never wait on the log file or the console
+_log_handlers = [
+    RotatingFileHandler('bot_detailed.log', maxBytes=10_000_000, backupCount=5),
+    logging.StreamHandler()
+]
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+
+_log_queue = queue.SimpleQueue()
+_queue_handler = QueueHandler(_log_queue)
+# The listener's handlers apply the full format, only the message is rendered here
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
+_log_listener = QueueListener(_log_queue, *_log_handlers, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 logger = logging.getLogger(__name__)
 
+# PTB logs every HTTP request at INFO, keep only problems
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
 # Database setup
 DATABASE_FILE = "tnetc_bot.db"
 
@@ -38,325 +74,663 @@ PROOF_IMAGES_DIR = "/Users/hieuho/tnetPortal/proof_images"
 # Add near the top with other constants
 TESTIMONIAL_IMAGES_DIR = "/Users/hieuho/tnetPortal/testimonial_images"
 
+# How often queued interactions and follow-up changes are written to the database (seconds)
+INTERACTION_FLUSH_INTERVAL = 0.5
+
+# How long a user's purchase status is cached before re-reading it (seconds)
+PURCHASE_CACHE_TTL = 300
+
+# Keep-alive connections to the Telegram API and updates processed at once
+TELEGRAM_POOL_SIZE = 64
+
+# How often the WAL is checkpointed (seconds)
+HOUSEKEEPING_INTERVAL = 60
+
+# How often SQLite is asked to refresh the statistics its query planner uses (seconds)
+OPTIMIZE_INTERVAL = 15 * 60
+
+# How long a user's profile is trusted before the users row is refreshed (seconds)
+KNOWN_USER_TTL = 3600
+
+# Delay before a follow-up is sent to a user who didn't purchase (seconds)
+FOLLOWUP_DELAY = 24 * 60 * 60
+
+# How long /user_info serves a user's rows from memory unless they are written (seconds)
+USER_INFO_CACHE_TTL = 60
+
+# Longest message sent in one piece, a little under Telegram's 4096 character limit
+MAX_MESSAGE_LENGTH = 4000
+
+# Longest pause between "something went wrong" replies to the same chat (seconds)
+ERROR_REPLY_MAX_BACKOFF = 60
+
+# Repeat taps on a static screen within this window are not answered with another copy (seconds)
+STATIC_SCREEN_COOLDOWN = 3
+
+# Optional testimonials are skipped while this many are waiting to be sent, at 2-3 photos
+# each that is already about 5 seconds of the bot's 30 messages/s budget
+MAX_PENDING_TESTIMONIALS = 60
+
+# A testimonial job that hasn't run this long after being scheduled was skipped, comfortably
+# above the longest testimonial delay (seconds)
+PENDING_TESTIMONIAL_TTL = 15
+
+# Messages sent to one private chat in a burst, and the period over which that burst refills (seconds)
+PRIVATE_CHAT_MAX_RATE = 3
+PRIVATE_CHAT_TIME_PERIOD = 3
+
+# Shared connection reused by all database helpers, guarded by _db_lock
+_conn = None
+_db_lock = threading.Lock()
+
+# Second connection for the admin reports, guarded by _read_lock. In WAL mode it reads
+# a committed snapshot, so long exports don't hold up the writers on _conn
+_read_conn = None
+_read_lock = threading.Lock()
+
+# Statements used by the database helpers, kept as constants so every call
+# hands sqlite3 the same string and hits its prepared-statement cache
+_SQL_UPSERT_USER = """
+    INSERT INTO users (user_id, username, first_name, last_name, join_date, last_interaction, campaign)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        username = excluded.username,
+        first_name = excluded.first_name,
+        last_name = excluded.last_name,
+        last_interaction = excluded.last_interaction
+"""
+_SQL_INSERT_INTERACTION = (
+    "INSERT INTO interactions (user_id, interaction_type, interaction_data, timestamp) VALUES (?, ?, ?, ?)"
+)
+_SQL_TOUCH_USER = "UPDATE users SET last_interaction = ? WHERE user_id = ?"
+_SQL_UPSERT_SERVICE_VIEW = """
+    INSERT INTO services_viewed (user_id, service, view_count, last_viewed)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (user_id, service) DO UPDATE SET
+        view_count = view_count + excluded.view_count,
+        last_viewed = excluded.last_viewed
+"""
+# Fold rows duplicated by older versions into the first row of each (user_id, service)
+_SQL_MERGE_SERVICE_VIEWS = """
+    UPDATE services_viewed SET
+        view_count = (
+            SELECT SUM(view_count) FROM services_viewed AS dup
+            WHERE dup.user_id IS services_viewed.user_id AND dup.service IS services_viewed.service
+        ),
+        last_viewed = (
+            SELECT MAX(last_viewed) FROM services_viewed AS dup
+            WHERE dup.user_id IS services_viewed.user_id AND dup.service IS services_viewed.service
+        )
+    WHERE rowid IN (
+        SELECT MIN(rowid) FROM services_viewed GROUP BY user_id, service HAVING COUNT(*) > 1
+    )
+"""
+_SQL_DELETE_DUPLICATE_SERVICE_VIEWS = """
+    DELETE FROM services_viewed
+    WHERE rowid NOT IN (SELECT MIN(rowid) FROM services_viewed GROUP BY user_id, service)
+"""
+_SQL_INSERT_PURCHASE = "INSERT INTO purchases (user_id, plan_code, purchase_date, price) VALUES (?, ?, ?, ?)"
+_SQL_MARK_PURCHASED = "UPDATE users SET purchased = 1 WHERE user_id = ?"
+_SQL_INSERT_FOLLOWUP = "INSERT INTO followups (user_id, service, scheduled_date) VALUES (?, ?, ?)"
+# A NULL response leaves the stored response untouched
+_SQL_UPDATE_FOLLOWUP_STATUS = (
+    "UPDATE followups SET status = ?, response = COALESCE(?, response) WHERE user_id = ? AND status = 'scheduled'"
+)
+# Existence check, a row comes back only for users who purchased. A single seek on
+# the users primary key
+_SQL_SELECT_PURCHASED = "SELECT 1 FROM users WHERE user_id = ? AND purchased = 1"
+_SQL_INSERT_TESTIMONIAL = (
+    "INSERT INTO testimonials (name, text, image_path, service, timestamp) VALUES (?, ?, ?, ?, ?)"
+)
+# A negative LIMIT returns every row
+_SQL_SELECT_TESTIMONIALS = (
+    "SELECT id, name, text, image_path, service, timestamp, active FROM testimonials ORDER BY timestamp DESC LIMIT ?"
+)
+_SQL_SET_TESTIMONIAL_ACTIVE = "UPDATE testimonials SET active = ? WHERE id = ?"
+_SQL_EXPORT_USERS = """
+    SELECT u.user_id, u.username, u.first_name, u.last_name, u.join_date, u.last_interaction, 
+           u.purchased, u.campaign, COUNT(DISTINCT p.id) as purchase_count
+    FROM users u
+    LEFT JOIN purchases p ON u.user_id = p.user_id
+    GROUP BY u.user_id
+"""
+
+# Settings applied to every new connection in one script.
+# WAL keeps readers off the writer's back and needs one fsync per commit,
+# synchronous=NORMAL is still crash-safe in WAL mode. A checkpoint after a
+# burst leaves the WAL file at its peak size, journal_size_limit cuts it back to 64 MB
+_CONNECTION_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    PRAGMA busy_timeout=5000;
+    PRAGMA mmap_size=268435456;
+    PRAGMA journal_size_limit=67108864;
+"""
+
 def create_connection():
     """Create a database connection to the SQLite database."""
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
+        conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False, cached_statements=256)
+        conn.executescript(_CONNECTION_PRAGMAS)
         return conn
     except Error as e:
         logger.error(f"Database connection error: {e}")
     
     return conn
 
-def create_tables():
-    """Create the necessary tables if they don't exist."""
-    conn = create_connection()
+def get_connection():
+    """Return the shared database connection, opening it on first use."""
+    global _conn
+    if _conn is None:
+        _conn = create_connection()
+    return _conn
+
+def get_read_connection():
+    """Return the connection used for admin reports, opening it on first use. Call with _read_lock held."""
+    global _read_conn
+    if _read_conn is None:
+        _read_conn = create_connection()
+    return _read_conn
+
+# Column definitions of every table, timestamps are stored as epoch seconds
+_TABLE_COLUMNS = {
+    # Users table
+    'users': '''
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        first_name TEXT,
+        last_name TEXT,
+        join_date INTEGER,
+        last_interaction INTEGER,
+        purchased INTEGER DEFAULT 0,
+        campaign TEXT
+    ''',
+    
+    # Interactions table
+    'interactions': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        interaction_type TEXT,
+        interaction_data TEXT,
+        timestamp INTEGER,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    ''',
+    
+    # Services viewed table
+    'services_viewed': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        service TEXT,
+        view_count INTEGER DEFAULT 1,
+        last_viewed INTEGER,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    ''',
+    
+    # Purchases table
+    'purchases': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        plan_code TEXT,
+        purchase_date INTEGER,
+        price TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    ''',
+    
+    # Follow-ups table
+    'followups': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        service TEXT,
+        scheduled_date INTEGER,
+        status TEXT DEFAULT 'scheduled',
+        response TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    ''',
+    
+    # Testimonials table
+    'testimonials': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        text TEXT,
+        image_path TEXT,
+        service TEXT,
+        timestamp INTEGER,
+        active INTEGER DEFAULT 1
+    ''',
+}
+
+# Columns that older databases stored as ISO-8601 text
+_INTEGER_COLUMNS = {
+    'users': ('join_date', 'last_interaction', 'purchased'),
+    'interactions': ('timestamp',),
+    'services_viewed': ('last_viewed',),
+    'purchases': ('purchase_date',),
+    'followups': ('scheduled_date',),
+    'testimonials': ('timestamp',),
+}
+
+def _iso_to_epoch(value):
+    """Convert an ISO-8601 timestamp written by older versions to epoch seconds."""
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        return None
+
+def format_timestamp(timestamp):
+    """Format an epoch timestamp for display."""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+def migrate_tables(conn):
+    """Rebuild tables that still declare TEXT timestamps and convert their values, in the caller's transaction."""
+    for table, columns in _INTEGER_COLUMNS.items():
+        declared = {row[1]: row[2].upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+        if all(declared.get(column) == 'INTEGER' for column in columns):
+            continue
+        
+        logger.info(f"Migrating {table} to integer timestamps")
+        
+        # SQLite cannot change a column type in place, so copy into a new table and swap it in
+        conn.execute(f"CREATE TABLE {table}_new ({_TABLE_COLUMNS[table]})")
+        conn.execute(f"INSERT INTO {table}_new SELECT * FROM {table}")
+        for column in columns:
+            rows = conn.execute(
+                f"SELECT rowid, {column} FROM {table}_new WHERE typeof({column}) = 'text'"
+            ).fetchall()
+            conn.executemany(
+                f"UPDATE {table}_new SET {column} = ? WHERE rowid = ?",
+                [(_iso_to_epoch(value), rowid) for rowid, value in rows]
+            )
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+def init_db():
+    """Create the necessary tables if they don't exist, in a single transaction."""
+    conn = get_connection()
     
     if conn is not None:
+        _db_lock.acquire()
         try:
             cursor = conn.cursor()
             
-            # Users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    join_date TEXT,
-                    last_interaction TEXT,
-                    purchased BOOLEAN DEFAULT 0,
-                    campaign TEXT
-                )
-            ''')
-            
-            # Interactions table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS interactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    interaction_type TEXT,
-                    interaction_data TEXT,
-                    timestamp TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # Services viewed table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS services_viewed (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    service TEXT,
-                    view_count INTEGER DEFAULT 1,
-                    last_viewed TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
+            # sqlite3 does not open transactions for DDL on its own
+            cursor.execute("BEGIN")
+            for table, columns in _TABLE_COLUMNS.items():
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+            
+            # Bring databases created by older versions up to date
+            migrate_tables(conn)
+            
+            # One row per user and service, required by the upsert in update_service_view,
+            # so rows duplicated by older versions are merged before the index is built
+            index_exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_sv_user_service'"
+            ).fetchone()
+            if not index_exists:
+                cursor.execute(_SQL_MERGE_SERVICE_VIEWS)
+                cursor.execute(_SQL_DELETE_DUPLICATE_SERVICE_VIEWS)
+            cursor.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_sv_user_service ON services_viewed (user_id, service)"
+            )
             
-            # Purchases table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS purchases (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    plan_code TEXT,
-                    purchase_date TEXT,
-                    price TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
+            # Indexes for the per-user lookups on the hot paths
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_fu_user_status ON followups (user_id, status)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_int_user_ts ON interactions (user_id, timestamp)")
             
-            # Follow-ups table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS followups (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    service TEXT,
-                    scheduled_date TEXT,
-                    status TEXT DEFAULT 'scheduled',
-                    response TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
+            # Lets the newest-first testimonial listing walk the index instead of sorting
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tst_ts ON testimonials (timestamp)")
             
-            # Testimonials table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS testimonials (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT,
-                    text TEXT,
-                    image_path TEXT,
-                    service TEXT,
-                    timestamp TEXT,
-                    active INTEGER DEFAULT 1
-                )
-            ''')
+            # Purchases are rarely written, so their user index also carries what /user_info reads
+            cursor.execute("DROP INDEX IF EXISTS idx_purchases_user")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_purchases_user_cover ON purchases (user_id, plan_code, purchase_date, price)"
+            )
             
             conn.commit()
             logger.info("Database tables created successfully")
         except Error as e:
+            conn.rollback()
             logger.error(f"Database table creation error: {e}")
         finally:
-            conn.close()
+            _db_lock.release()
     else:
         logger.error("Cannot create database connection")
 
-def save_user(user_id, username, first_name, last_name, campaign=None):
+def save_user(user_id, username, first_name, last_name, campaign=None, now=None):
     """Save or update user information in the database."""
-    conn = create_connection()
+    conn = get_connection()
     
     if conn is not None:
+        _db_lock.acquire()
         try:
-            cursor = conn.cursor()
-            
-            # Check if user exists
-            cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-            user = cursor.fetchone()
+            current_time = now or int(time.time())
             
-            current_time = datetime.now().isoformat()
-            
-            if user is None:
-                # New user
-                cursor.execute(
-                    "INSERT INTO users (user_id, username, first_name, last_name, join_date, last_interaction, campaign) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    (user_id, username, first_name, last_name, current_time, current_time, campaign)
-                )
-                logger.info(f"New user added to database: {user_id}")
-            else:
-                # Update existing user
-                cursor.execute(
-                    "UPDATE users SET username = ?, first_name = ?, last_name = ?, last_interaction = ? WHERE user_id = ?",
-                    (username, first_name, last_name, current_time, user_id)
-                )
-                logger.info(f"User updated in database: {user_id}")
+            # Insert new users, refresh the profile of existing ones
+            conn.execute(
+                _SQL_UPSERT_USER,
+                (user_id, username, first_name, last_name, current_time, current_time, campaign)
+            )
+            logger.debug(f"User saved to database: {user_id}")
             
             conn.commit()
         except Error as e:
+            conn.rollback()
             logger.error(f"Database user save error: {e}")
         finally:
-            conn.close()
+            _db_lock.release()
     else:
         logger.error("Cannot create database connection")
 
-def log_interaction_to_db(user_id, interaction_type, interaction_data):
-    """Log user interaction to the database."""
-    conn = create_connection()
+# Interactions waiting to be written by flush_interactions(), payloads are encoded there
+_pending_interactions = deque()
+
+# Compact encoder reused for every interaction payload, orjson's C encoder when it is installed
+if orjson is not None:
+    def _json_encode(data):
+        return orjson.dumps(data).decode()
+else:
+    _json_encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+def _pack_json(data):
+    """Serialize an interaction payload, skipping the encoder for empty ones."""
+    return "{}" if not data else _json_encode(data)
+
+def log_interaction_to_db(user_id, interaction_type, interaction_data, now=None):
+    """Queue a user interaction to be written to the database."""
+    current_time = now or int(time.time())
+    _pending_interactions.append((user_id, interaction_type, interaction_data, current_time))
+
+def flush_interactions():
+    """Write all queued interactions to the database in a single transaction."""
+    if not _pending_interactions:
+        return
+    
+    conn = get_connection()
     
     if conn is not None:
+        batch = []
+        while _pending_interactions:
+            user_id, interaction_type, data, timestamp = _pending_interactions.popleft()
+            try:
+                batch.append((user_id, interaction_type, _pack_json(data), timestamp))
+            except (TypeError, ValueError) as e:
+                # Drop a payload the encoder can't handle rather than the whole batch
+                logger.error(f"Cannot encode {interaction_type} interaction of user {user_id}: {e}")
+        
+        # Only the latest interaction per user matters for last_interaction
+        last_interactions = {}
+        for user_id, _, _, timestamp in batch:
+            last_interactions[user_id] = max(timestamp, last_interactions.get(user_id, timestamp))
+        
+        _db_lock.acquire()
         try:
-            cursor = conn.cursor()
-            
-            # Update last interaction time
-            current_time = datetime.now().isoformat()
-            cursor.execute(
-                "UPDATE users SET last_interaction = ? WHERE user_id = ?",
-                (current_time, user_id)
-            )
-            
-            # Insert interaction record
-            cursor.execute(
-                "INSERT INTO interactions (user_id, interaction_type, interaction_data, timestamp) VALUES (?, ?, ?, ?)",
-                (user_id, interaction_type, json.dumps(interaction_data), current_time)
-            )
-            
-            conn.commit()
+            with conn:
+                conn.executemany(
+                    _SQL_INSERT_INTERACTION,
+                    batch
+                )
+                conn.executemany(
+                    _SQL_TOUCH_USER,
+                    [(timestamp, user_id) for user_id, timestamp in last_interactions.items()]
+                )
         except Error as e:
-            logger.error(f"Database interaction log error: {e}")
+            logger.error(f"Database interaction flush error: {e}")
         finally:
-            conn.close()
+            _db_lock.release()
     else:
         logger.error("Cannot create database connection")
 
-def update_service_view(user_id, service):
-    """Update the services viewed by the user."""
-    conn = create_connection()
+def _flush_pending_writes():
+    """Write queued interactions, service views and follow-up changes to the database."""
+    flush_interactions()
+    flush_service_views()
+    flush_followup_writes()
+
+# Whatever is still queued is written on the way out, whether polling stopped cleanly or not.
+# Registered after the log listener, so it runs while logging still works
+atexit.register(_flush_pending_writes)
+
+async def flush_interactions_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Periodic job that writes queued interactions, service views and follow-up changes to the database."""
+    await asyncio.to_thread(_flush_pending_writes)
+
+# user_id -> rows shown by /user_info, dropped whenever one of the user's rows is written.
+# Worker threads share it, TTLCache is not thread-safe on its own
+_user_info_cache = TTLCache(maxsize=256, ttl=USER_INFO_CACHE_TTL)
+_user_info_cache_lock = threading.Lock()
+
+def _forget_user_info(*user_ids):
+    """Drop the cached /user_info rows of the given users."""
+    with _user_info_cache_lock:
+        for user_id in user_ids:
+            _user_info_cache.pop(user_id, None)
+
+# (user_id, service) -> (views, last viewed) counted since the last flush_service_views()
+_pending_service_views = {}
+_pending_service_views_lock = threading.Lock()
+
+def update_service_view(user_id, service, now=None):
+    """Count a view of a service by the user, to be written by flush_service_views()."""
+    current_time = now or int(time.time())
+    key = (user_id, service)
+    with _pending_service_views_lock:
+        views = _pending_service_views.get(key)
+        _pending_service_views[key] = (views[0] + 1 if views else 1, current_time)
+
+def flush_service_views():
+    """Add the counted service views to the database in a single transaction."""
+    if not _pending_service_views:
+        return
+    
+    conn = get_connection()
     
     if conn is not None:
+        with _pending_service_views_lock:
+            batch = list(_pending_service_views.items())
+            _pending_service_views.clear()
+        
+        _db_lock.acquire()
         try:
-            cursor = conn.cursor()
-            current_time = datetime.now().isoformat()
-            
-            # Check if service view exists
-            cursor.execute("SELECT * FROM services_viewed WHERE user_id = ? AND service = ?", (user_id, service))
-            service_view = cursor.fetchone()
-            
-            if service_view is None:
-                # New service view
-                cursor.execute(
-                    "INSERT INTO services_viewed (user_id, service, last_viewed) VALUES (?, ?, ?)",
-                    (user_id, service, current_time)
-                )
-            else:
-                # Update existing service view
-                cursor.execute(
-                    "UPDATE services_viewed SET view_count = view_count + 1, last_viewed = ? WHERE user_id = ? AND service = ?",
-                    (current_time, user_id, service)
+            # Insert the first views or add to the counter of existing ones
+            with conn:
+                conn.executemany(
+                    _SQL_UPSERT_SERVICE_VIEW,
+                    [(user_id, service, views, last_viewed) for (user_id, service), (views, last_viewed) in batch]
                 )
-            
-            conn.commit()
+            _forget_user_info(*(user_id for (user_id, _), _ in batch))
         except Error as e:
-            logger.error(f"Database service view update error: {e}")
+            logger.error(f"Database service view flush error: {e}")
         finally:
-            conn.close()
+            _db_lock.release()
     else:
         logger.error("Cannot create database connection")
 
-def record_purchase(user_id, plan_code, price):
+def record_purchase(user_id, plan_code, price, now=None):
     """Record a user purchase in the database."""
-    conn = create_connection()
+    conn = get_connection()
     
     if conn is not None:
+        _db_lock.acquire()
         try:
-            cursor = conn.cursor()
-            current_time = datetime.now().isoformat()
-            
-            # Insert purchase record
-            cursor.execute(
-                "INSERT INTO purchases (user_id, plan_code, purchase_date, price) VALUES (?, ?, ?, ?)",
-                (user_id, plan_code, current_time, price)
-            )
-            
-            # Mark user as having purchased
-            cursor.execute(
-                "UPDATE users SET purchased = 1 WHERE user_id = ?",
-                (user_id,)
-            )
+            current_time = now or int(time.time())
+            
+            # Record the purchase and flag the user atomically
+            with conn:
+                # Insert purchase record
+                conn.execute(
+                    _SQL_INSERT_PURCHASE,
+                    (user_id, plan_code, current_time, price)
+                )
+                
+                # Mark user as having purchased
+                conn.execute(_SQL_MARK_PURCHASED, (user_id,))
             
-            conn.commit()
+            _purchasers.add(user_id)
+            with _purchased_cache_lock:
+                _purchased_cache.pop(user_id, None)
+            _forget_user_info(user_id)
             logger.info(f"Purchase recorded for user {user_id}: {plan_code} at {price}")
         except Error as e:
             logger.error(f"Database purchase record error: {e}")
         finally:
-            conn.close()
+            _db_lock.release()
     else:
         logger.error("Cannot create database connection")
 
+# Follow-up writes of (statement, parameters) waiting for flush_followup_writes(), kept in
+# arrival order so status changes only reach the follow-ups queued before them
+_pending_followup_writes = deque()
+
+def record_followups_bulk(rows):
+    """Queue several scheduled follow-ups of (user_id, service, scheduled_date) for writing."""
+    for user_id, service, scheduled_date in rows:
+        _pending_followup_writes.append((_SQL_INSERT_FOLLOWUP, (user_id, service, scheduled_date)))
+        logger.info(f"Follow-up scheduled for user {user_id} for {service} on {format_timestamp(scheduled_date)}")
+
 def record_followup(user_id, service, scheduled_date):
     """Record a scheduled follow-up in the database."""
-    conn = create_connection()
+    record_followups_bulk([(user_id, service, scheduled_date)])
+
+def update_followup_status(user_id, status, response=None):
+    """Queue a status change for the user's scheduled follow-ups."""
+    _pending_followup_writes.append((_SQL_UPDATE_FOLLOWUP_STATUS, (status, response or None, user_id)))
+
+def flush_followup_writes():
+    """Apply all queued follow-up writes in a single transaction, in order."""
+    if not _pending_followup_writes:
+        return
+    
+    conn = get_connection()
     
     if conn is not None:
+        batch = []
+        while _pending_followup_writes:
+            batch.append(_pending_followup_writes.popleft())
+        
+        _db_lock.acquire()
         try:
-            cursor = conn.cursor()
+            with conn:
+                # One executemany per run of consecutive writes using the same statement
+                for sql, group in groupby(batch, key=itemgetter(0)):
+                    conn.executemany(sql, [params for _, params in group])
             
-            # Insert followup record
-            cursor.execute(
-                "INSERT INTO followups (user_id, service, scheduled_date) VALUES (?, ?, ?)",
-                (user_id, service, scheduled_date)
-            )
+            for sql, params in batch:
+                if sql is _SQL_UPDATE_FOLLOWUP_STATUS:
+                    logger.info(f"Follow-up status updated for user {params[2]} to {params[0]}")
             
-            conn.commit()
-            logger.info(f"Follow-up scheduled for user {user_id} for {service} on {scheduled_date}")
+            # Inserts carry the user first, status changes last
+            _forget_user_info(*(params[0] if sql is _SQL_INSERT_FOLLOWUP else params[-1] for sql, params in batch))
         except Error as e:
-            logger.error(f"Database followup record error: {e}")
+            logger.error(f"Database followup write error: {e}")
         finally:
-            conn.close()
+            _db_lock.release()
     else:
         logger.error("Cannot create database connection")
 
-def update_followup_status(user_id, status, response=None):
-    """Update the status of a follow-up."""
-    conn = create_connection()
+def _housekeep():
+    """Let the WAL be copied back into the database."""
+    conn = get_connection()
     
     if conn is not None:
+        _db_lock.acquire()
         try:
-            cursor = conn.cursor()
-            
-            if response:
-                cursor.execute(
-                    "UPDATE followups SET status = ?, response = ? WHERE user_id = ? AND status = 'scheduled'",
-                    (status, response, user_id)
-                )
-            else:
-                cursor.execute(
-                    "UPDATE followups SET status = ? WHERE user_id = ? AND status = 'scheduled'",
-                    (status, user_id)
-                )
-            
-            conn.commit()
-            logger.info(f"Follow-up status updated for user {user_id} to {status}")
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
         except Error as e:
-            logger.error(f"Database followup status update error: {e}")
+            logger.error(f"Database checkpoint error: {e}")
         finally:
-            conn.close()
-    else:
-        logger.error("Cannot create database connection")
+            _db_lock.release()
+
+async def housekeeping_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Periodic job that checkpoints the WAL."""
+    await asyncio.to_thread(_housekeep)
+
+def _optimize():
+    """Let SQLite re-analyze the tables whose statistics have gone stale."""
+    conn = get_connection()
+    
+    if conn is not None:
+        _db_lock.acquire()
+        try:
+            conn.execute("PRAGMA optimize")
+        except Error as e:
+            logger.error(f"Database optimize error: {e}")
+        finally:
+            _db_lock.release()
+
+async def optimize_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Periodic job that keeps the query planner statistics current."""
+    await asyncio.to_thread(_optimize)
+
+# user_id -> False for users who hadn't purchased, checked again after PURCHASE_CACHE_TTL.
+# Worker threads share it, TTLCache is not thread-safe on its own
+_purchased_cache = TTLCache(maxsize=10000, ttl=PURCHASE_CACHE_TTL)
+_purchased_cache_lock = threading.Lock()
+
+# Users known to have purchased. A purchase is never undone, so these need no expiry
+_purchasers = set()
+
+def _cached_purchase(user_id):
+    """Return the cached purchase state of a user, or None when the database has to be asked."""
+    if user_id in _purchasers:
+        return True
+    
+    with _purchased_cache_lock:
+        return _purchased_cache.get(user_id)
 
 def has_purchased(user_id):
     """Check if a user has made a purchase."""
-    conn = create_connection()
+    purchased = _cached_purchase(user_id)
+    if purchased is not None:
+        return purchased
+    
+    conn = get_connection()
     
     if conn is not None:
+        _db_lock.acquire()
         try:
             cursor = conn.cursor()
             
-            cursor.execute("SELECT purchased FROM users WHERE user_id = ?", (user_id,))
-            result = cursor.fetchone()
-            
-            if result and result[0] == 1:
-                return True
-            return False
+            cursor.execute(_SQL_SELECT_PURCHASED, (user_id,))
+            purchased = cursor.fetchone() is not None
+            if purchased:
+                _purchasers.add(user_id)
+            else:
+                with _purchased_cache_lock:
+                    _purchased_cache[user_id] = False
+            return purchased
         except Error as e:
+            conn.rollback()
             logger.error(f"Database purchase check error: {e}")
         finally:
-            conn.close()
+            _db_lock.release()
     else:
         logger.error("Cannot create database connection")
     
     return False
 
+async def check_purchased(user_id):
+    """Check if a user has made a purchase, going to a worker thread only on a cache miss."""
+    purchased = _cached_purchase(user_id)
+    if purchased is None:
+        purchased = await asyncio.to_thread(has_purchased, user_id)
+    return purchased
+
 def add_testimonial(name, text, image_path, service):
     """Add a new testimonial to the database."""
-    conn = create_connection()
+    conn = get_connection()
     
     if conn is not None:
+        _db_lock.acquire()
         try:
             cursor = conn.cursor()
-            current_time = datetime.now().isoformat()
+            current_time = int(time.time())
             
             cursor.execute(
-                "INSERT INTO testimonials (name, text, image_path, service, timestamp) VALUES (?, ?, ?, ?, ?)",
+                _SQL_INSERT_TESTIMONIAL,
                 (name, text, image_path, service, current_time)
             )
             
@@ -364,150 +738,263 @@ def add_testimonial(name, text, image_path, service):
             logger.info(f"New testimonial added for {name} on service {service}")
             return cursor.lastrowid
         except Error as e:
+            conn.rollback()
             logger.error(f"Database testimonial save error: {e}")
         finally:
-            conn.close()
+            _db_lock.release()
     else:
         logger.error("Cannot create database connection")
     
     return None
 
+def add_testimonials_bulk(rows):
+    """Add (name, text, image_path, service) testimonials in a single transaction, returning how many were added."""
+    conn = get_connection()
+    
+    if conn is not None:
+        _db_lock.acquire()
+        try:
+            current_time = int(time.time())
+            
+            with conn:
+                cursor = conn.executemany(
+                    _SQL_INSERT_TESTIMONIAL,
+                    ((name, text, image_path, service, current_time) for name, text, image_path, service in rows)
+                )
+            
+            logger.info(f"{cursor.rowcount} testimonials added")
+            return cursor.rowcount
+        except Error as e:
+            logger.error(f"Database testimonial bulk save error: {e}")
+        finally:
+            _db_lock.release()
+    else:
+        logger.error("Cannot create database connection")
+    
+    return 0
+
+_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# (directory, extensions) -> (directory mtime, image file names) of its last scan.
+# A race between threads only means the directory is scanned twice
+_image_listings = {}
+
+def list_images(directory, extensions=_IMAGE_EXTENSIONS):
+    """Return the image file names in a directory, rescanning it only after its entries changed."""
+    key = (directory, extensions)
+    mtime = os.stat(directory).st_mtime_ns
+    listing = _image_listings.get(key)
+    if listing is not None and listing[0] == mtime:
+        return listing[1]
+    
+    with os.scandir(directory) as entries:
+        files = tuple(
+            entry.name for entry in entries
+            if entry.name.lower().endswith(extensions) and not entry.name.startswith('.') and entry.is_file()
+        )
+    _image_listings[key] = (mtime, files)
+    return files
+
+def read_image(path):
+    """Return the contents of an image file, or None if it was removed since it was listed."""
+    try:
+        return Path(path).read_bytes()
+    except FileNotFoundError:
+        return None
+
 def get_random_testimonials(service=None, limit=3):
     """Get random testimonials from image directory with generated content."""
     try:
-        # Get all testimonial images
-        image_files = [f for f in os.listdir(TESTIMONIAL_IMAGES_DIR) 
-                      if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+        # Pick the images first so only the chosen ones get an entry
+        image_files = list_images(TESTIMONIAL_IMAGES_DIR)
+        selected_images = random.sample(image_files, min(limit, len(image_files)))
         
-        # Create testimonial entries
-        testimonials = []
-        for img_file in image_files:
-            testimonials.append({
+        return [
+            {
                 'name': "Verified Member",
                 'text': "This service changed my trading completely!",
                 'image_path': os.path.join(TESTIMONIAL_IMAGES_DIR, img_file),
                 'service': 'general'
-            })
-        
-        # Randomize and limit results
-        random.shuffle(testimonials)
-        return testimonials[:limit]
+            }
+            for img_file in selected_images
+        ]
         
     except Exception as e:
         logger.error(f"Error loading testimonial images: {str(e)}")
         return []
 
-def get_all_testimonials():
-    """Get all testimonials from the database."""
-    conn = create_connection()
+def run_read_queries(*queries):
+    """Run (sql, params) read queries on the report connection and return the rows of each."""
+    _read_lock.acquire()
+    try:
+        conn = get_read_connection()
+        if conn is None:
+            raise Error("Cannot create database connection")
+        
+        cursor = conn.cursor()
+        return [cursor.execute(sql, params).fetchall() for sql, params in queries]
+    finally:
+        _read_lock.release()
+
+_EXPORT_USERS_HEADER = (
+    'User ID', 'Username', 'First Name', 'Last Name', 'Join Date',
+    'Last Interaction', 'Purchased', 'Campaign', 'Purchase Count'
+)
+
+def fetch_user_info(user_id):
+    """Return the users row and the service view, purchase and follow-up rows of a user."""
+    with _user_info_cache_lock:
+        info = _user_info_cache.get(user_id)
+    if info is not None:
+        return info
+    
+    info = run_read_queries(
+        (
+            "SELECT username, first_name, last_name, join_date, last_interaction, purchased, campaign "
+            "FROM users WHERE user_id = ?",
+            (user_id,)
+        ),
+        ("SELECT service, view_count, last_viewed FROM services_viewed WHERE user_id = ?", (user_id,)),
+        ("SELECT plan_code, purchase_date, price FROM purchases WHERE user_id = ?", (user_id,)),
+        ("SELECT service, scheduled_date, status, response FROM followups WHERE user_id = ?", (user_id,))
+    )
+    with _user_info_cache_lock:
+        _user_info_cache[user_id] = info
+    return info
+
+def export_users_csv():
+    """Write every user as a CSV row into a bytes buffer, returning the buffer and row count."""
+    # Rows are encoded straight into the buffer as the cursor yields them
+    buf = io.BytesIO()
+    text = io.TextIOWrapper(buf, encoding='utf-8', newline='', write_through=True)
+    csv_writer = csv.writer(text)
+    csv_writer.writerow(_EXPORT_USERS_HEADER)
+    
+    count = 0
+    _read_lock.acquire()
+    try:
+        conn = get_read_connection()
+        if conn is None:
+            raise Error("Cannot create database connection")
+        
+        for user in conn.execute(_SQL_EXPORT_USERS):
+            csv_writer.writerow(
+                user[:4] + (format_timestamp(user[4]), format_timestamp(user[5])) + user[6:]
+            )
+            count += 1
+    finally:
+        _read_lock.release()
     
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM testimonials ORDER BY timestamp DESC")
-            testimonials = cursor.fetchall()
-            return testimonials
-        except Error as e:
-            logger.error(f"Database testimonial query error: {e}")
-        finally:
-            conn.close()
-    else:
-        logger.error("Cannot create database connection")
+    # Let go of the buffer without closing it
+    text.detach()
+    buf.seek(0)
+    return buf, count
+
+def get_all_testimonials(limit=-1):
+    """Get testimonials from the database newest first, all of them unless a limit is given."""
+    try:
+        # A read, so it stays off the writers' connection
+        return run_read_queries((_SQL_SELECT_TESTIMONIALS, (limit,)))[0]
+    except Error as e:
+        logger.error(f"Database testimonial query error: {e}")
     
     return []
 
 def toggle_testimonial_status(testimonial_id, active=True):
     """Activate or deactivate a testimonial."""
-    conn = create_connection()
+    conn = get_connection()
     
     if conn is not None:
+        _db_lock.acquire()
         try:
             cursor = conn.cursor()
             cursor.execute(
-                "UPDATE testimonials SET active = ? WHERE id = ?",
+                _SQL_SET_TESTIMONIAL_ACTIVE,
                 (1 if active else 0, testimonial_id)
             )
             conn.commit()
             logger.info(f"Testimonial {testimonial_id} set to active={active}")
             return True
         except Error as e:
+            conn.rollback()
             logger.error(f"Database testimonial update error: {e}")
         finally:
-            conn.close()
+            _db_lock.release()
     else:
         logger.error("Cannot create database connection")
     
     return False
 
-# Initialize database tables
-create_tables()
-
-# Dictionary to track user engagement (will be replaced by database)
-user_engagement = {}
-
-def log_user_interaction(update, interaction_type, data=None):
-    """Log user interaction for analytics."""
+# Price of each plan code, recorded with the purchase by handle_payment_confirmation
+_PLAN_PRICE = MappingProxyType({
+    'monthly': "$200",
+    'quarterly': "$500",
+    'annual': "$1500",
+    'copytrade': "$500",
+    'standard_trial': "Free Trial",
+    'standard_monthly': "$66/month",
+    'standard_lifetime': "$300",
+    'vip_monthly': "$300/month",
+    'vip_lifetime': "$2000",
+})
+
+# Display name of each plan code, shared by the purchase and payment confirmation messages
+_PLAN_NAMES = MappingProxyType({
+    'monthly': "Monthly EA Plan",
+    'quarterly': "Quarterly EA Plan",
+    'annual': "Annual EA Plan",
+    'copytrade': "Copytrade Lifetime Plan",
+    'standard_trial': "Standard Trial Plan",
+    'standard_monthly': "Standard Monthly Plan",
+    'standard_lifetime': "Standard Lifetime Plan",
+    'vip_monthly': "VIP Monthly Plan",
+    'vip_lifetime': "VIP Lifetime Plan",
+})
+
+# user_id -> (username, first_name, last_name) last written to the users table
+_known_users = TTLCache(maxsize=10000, ttl=KNOWN_USER_TTL)
+
+def _log_user_interaction(update, interaction_type, data=None, refresh_user=True, now=None):
+    """Write a user interaction and its side effects to the database."""
     if update.effective_user:
         user_id = update.effective_user.id
         username = update.effective_user.username
         first_name = update.effective_user.first_name
         last_name = update.effective_user.last_name
         
-        # Save user to database
-        save_user(user_id, username, first_name, last_name)
+        # One timestamp shared by every write for this interaction
+        now = now or int(time.time())
+        
+        # Save user to database, last_interaction alone is kept current by flush_interactions()
+        if refresh_user:
+            save_user(user_id, username, first_name, last_name, now=now)
         
         # Log interaction to database
         if data:
-            log_interaction_to_db(user_id, interaction_type, data)
+            log_interaction_to_db(user_id, interaction_type, data, now=now)
         else:
-            log_interaction_to_db(user_id, interaction_type, {})
-        
-        # For backward compatibility, also update the user_engagement dictionary
-        if user_id not in user_engagement:
-            user_engagement[user_id] = {
-                'services_viewed': [],
-                'last_interaction': datetime.now().isoformat(),
-                'purchased': False
-            }
-        
-        user_engagement[user_id]['last_interaction'] = datetime.now().isoformat()
+            log_interaction_to_db(user_id, interaction_type, {}, now=now)
         
         if interaction_type == 'service_view' and 'service' in data:
-            service = data['service']
-            if service not in user_engagement[user_id]['services_viewed']:
-                user_engagement[user_id]['services_viewed'].append(service)
-            
             # Update service view in database
-            update_service_view(user_id, service)
-        
-        elif interaction_type == 'payment_confirmation':
-            user_engagement[user_id]['purchased'] = True
-            
-            # Record purchase in database if plan info is available
-            if 'plan' in data:
-                plan_code = data['plan']
-                price = "Unknown"
-                
-                if plan_code == 'monthly':
-                    price = "$200"
-                elif plan_code == 'quarterly':
-                    price = "$500"
-                elif plan_code == 'annual':
-                    price = "$1500"
-                elif plan_code == 'copytrade':
-                    price = "$500"
-                elif plan_code == 'standard_trial':
-                    price = "Free Trial"
-                elif plan_code == 'standard_monthly':
-                    price = "$66/month"
-                elif plan_code == 'standard_lifetime':
-                    price = "$300"
-                elif plan_code == 'vip_monthly':
-                    price = "$300/month"
-                elif plan_code == 'vip_lifetime':
-                    price = "$2000"
-                
-                record_purchase(user_id, plan_code, price)
+            update_service_view(user_id, data['service'], now=now)
+
+async def log_user_interaction(update, interaction_type, data=None, now=None):
+    """Log user interaction for analytics without blocking the event loop."""
+    user = update.effective_user
+    refresh_user = False
+    if user:
+        # Only rewrite the users row for new users or changed profiles
+        profile = (user.username, user.first_name, user.last_name)
+        if _known_users.get(user.id) != profile:
+            _known_users[user.id] = profile
+            refresh_user = True
+    
+    # Everything but the users row is only queued, which is cheap enough for the event loop
+    if refresh_user:
+        await asyncio.to_thread(_log_user_interaction, update, interaction_type, data, refresh_user, now)
+    else:
+        _log_user_interaction(update, interaction_type, data, refresh_user, now)
 
 def validate_token():
     """Validate the bot token from environment variables."""
@@ -529,11 +1016,13 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if context.args and len(context.args) > 0:
         campaign = context.args[0]
     
-    # Save user to database with campaign info
-    save_user(user.id, user.username, user.first_name, user.last_name, campaign)
+    # Save user to database with campaign info, in the background so the welcome isn't held up
+    _in_background(asyncio.to_thread(save_user, user.id, user.username, user.first_name, user.last_name, campaign))
+    # The row is being written, spare log_user_interaction a second upsert
+    _known_users[user.id] = (user.username, user.first_name, user.last_name)
     
     # Log start command
-    log_user_interaction(update, "start_command", {"campaign": campaign})
+    _in_background(log_user_interaction(update, "start_command", {"campaign": campaign}))
     
     # Determine which welcome message to show based on campaign
     if campaign == 'ea_campaign':
@@ -545,805 +1034,647 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     else:
         await regular_welcome(update, context)
 
-async def regular_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Send a detailed welcome message with all service options."""
-    message = None
-    chat_id = None
-    
-    if update.message:
-        message = update.message
-        chat_id = update.message.chat_id
-        user = update.message.from_user
-    elif update.callback_query:
-        message = update.callback_query.message
-        chat_id = update.callback_query.message.chat_id
-        user = update.callback_query.from_user
-    else:
-        logger.error("Cannot identify message or user in regular_welcome")
-        return
-    
-    # Log user interaction
-    log_user_interaction(update, "welcome", {
-        "source": "regular",
-        "timestamp": datetime.now().isoformat()
-    })
-    
-    # Save user if new
-    user_first_name = user.first_name if hasattr(user, 'first_name') else ''
-    user_last_name = user.last_name if hasattr(user, 'last_name') else ''
-    username = user.username if hasattr(user, 'username') else ''
-    
-    save_user(chat_id, username, user_first_name, user_last_name)
-    
-    # Welcome message with FOMO elements
-    welcome_text = (
-        f"*🔥 Welcome to TNETC Trading's EXCLUSIVE Community! 🔥*\n\n"
-        f"You've just discovered what the top 1% of traders DON'T want you to know. Our members are silently making consistent profits while others struggle.\n\n"
-        f"*⚠️ LIMITED-TIME OPPORTUNITIES:*\n\n"
-        f"*1. 🚀 X10 CHALLENGE - ALMOST SOLD OUT!*\n"
-        f"• 10X your account in just 66 days (proven strategy)\n"
-        f"• *ONLY 17 SLOTS LEFT* out of 100\n"
-        f"• *$350 VALUE → $0 (FREE)* - Offer ends this week!\n\n"
-        f"*2. 💰 LIFETIME COPYTRADE - NEVER OFFERED AGAIN*\n"
-        f"• Automated profits without lifting a finger\n"
-        f"• Members already making $500-$2500/week\n"
-        f"• *$500 VALUE → $0 (FREE LIFETIME)* - Last chance!\n\n"
-        f"*3. 💎 PREMIUM VIP SIGNAL + EA TRADING BOT*\n"
-        f"• Our most elite package (94% win rate last month)\n"
-        f"• Members reporting 40%+ monthly returns\n"
-        f"• *ONLY 5 SPOTS* available at current pricing\n\n"
-        f"*⏰ Which opportunity will you grab before it's gone?*"
-    )
-    
-    # Create keyboard
-    keyboard = [
+# Welcome message text for each campaign variant
+_WELCOME_TEXT = {
+    'regular': (
+        "<b>🔥 Welcome to TNETC Trading's EXCLUSIVE Community! 🔥</b>\n\n"
+        "You've just discovered what the top 1% of traders DON'T want you to know. Our members are silently making consistent profits while others struggle.\n\n"
+        "<b>⚠️ LIMITED-TIME OPPORTUNITIES:</b>\n\n"
+        "<b>1. 🚀 X10 CHALLENGE - ALMOST SOLD OUT!</b>\n"
+        "• 10X your account in just 66 days (proven strategy)\n"
+        "• <b>ONLY 17 SLOTS LEFT</b> out of 100\n"
+        "• <b>$350 VALUE → $0 (FREE)</b> - Offer ends this week!\n\n"
+        "<b>2. 💰 LIFETIME COPYTRADE - NEVER OFFERED AGAIN</b>\n"
+        "• Automated profits without lifting a finger\n"
+        "• Members already making $500-$2500/week\n"
+        "• <b>$500 VALUE → $0 (FREE LIFETIME)</b> - Last chance!\n\n"
+        "<b>3. 💎 PREMIUM VIP SIGNAL + EA TRADING BOT</b>\n"
+        "• Our most elite package (94% win rate last month)\n"
+        "• Members reporting 40%+ monthly returns\n"
+        "• <b>ONLY 5 SPOTS</b> available at current pricing\n\n"
+        "<b>⏰ Which opportunity will you grab before it's gone?</b>"
+    ),
+    'ea': (
+        "<b>🔥 EXCLUSIVE ACCESS: TNETC PREMIUM TRADING SYSTEMS 🔥</b>\n\n"
+        "You're among the select few to access our elite trading solutions that most traders will NEVER discover.\n\n"
+        "<b>⚠️ TIME-SENSITIVE OPPORTUNITIES:</b>\n\n"
+        "<b>🚀 X10 CHALLENGE - 83% SOLD OUT!</b>\n"
+        "- Only 17 of 100 slots remaining\n"
+        "- Our last challenge: 10X in JUST 66 days\n"
+        "- Members reporting life-changing gains\n"
+        "- <b>$350 VALUE - FREE ACCESS CLOSING THIS WEEK!</b>\n\n"
+        "<b>💰 COPYTRADE SYSTEM - FINAL OFFER EVER</b>\n"
+        "- Set &amp; forget account growth (we trade for you)\n"
+        "- Current members earning $500-$2500/week\n"
+        "- Zero experience needed - 100% automated\n"
+        "- <b>$500 VALUE - LIFETIME FREE ACCESS ENDING SOON</b>\n\n"
+        "<b>💎 PREMIUM VIP + EA TRADING BOT - ALMOST FULL</b>\n"
+        "- Our most powerful system (80% win rate)\n"
+        "- Last month: FX +40.36% | GOLD +19.41%\n"
+        "- Members consistently outperforming the market\n"
+        "- <b>ONLY 5 SPOTS LEFT at current pricing!</b>\n\n"
+        "<b>⏰ WHICH OPPORTUNITY WILL YOU CLAIM BEFORE IT'S GONE?</b>"
+    ),
+    'signal': (
+        "<b>🚨 URGENT: TNETC SIGNAL SERVICE - LIMITED ACCESS 🚨</b>\n\n"
+        "You're viewing our ELITE signal service that most retail traders will never discover (94% win rate).\n\n"
+        "<b>⚠️ ACT FAST - LIMITED OPPORTUNITIES:</b>\n\n"
+        "<b>🚀 X10 CHALLENGE - NEARLY SOLD OUT!</b>\n"
+        "- Only 17 slots remaining (83% already claimed)\n"
+        "- Previous members: 10X gains in just 66 days\n"
+        "- Proven strategy with verifiable results\n"
+        "- <b>$350 VALUE - FREE ACCESS ENDS THIS WEEK!</b>\n\n"
+        "<b>💰 COPYTRADE SYSTEM - LAST CHANCE EVER</b>\n"
+        "- Hands-free profits (we trade for you)\n"
+        "- Current members earning $500-$2500 weekly\n"
+        "- 100% automated - no experience required\n"
+        "- <b>$500 VALUE - LIFETIME FREE ACCESS CLOSING SOON</b>\n\n"
+        "<b>💎 PREMIUM VIP SIGNAL + EA BOT - 5 SPOTS LEFT</b>\n"
+        "- Our most powerful combo (highest returns)\n"
+        "- Last month: +40.36% on FX, +19.41% on GOLD\n"
+        "- Members consistently outperforming markets\n"
+        "- <b>PRICE INCREASING NEXT WEEK - LAST CHANCE!</b>\n\n"
+        "<b>⏰ DON'T MISS OUT - THESE OFFERS EXPIRE SOON!</b>"
+    ),
+    'vip': (
+        "<b>💎 EXCLUSIVE: TNETC VIP INNER CIRCLE - BY INVITATION ONLY 💎</b>\n\n"
+        "You've been granted access to our ELITE trading community that only the top 1% of traders ever discover.\n\n"
+        "<b>⚠️ URGENT - FINAL ROUND OF OPPORTUNITIES:</b>\n\n"
+        "<b>🚀 X10 CHALLENGE - 83% FILLED!</b>\n"
+        "- Just 17 slots remain from original 100\n"
+        "- Previous challenge: 10X return in 66 days\n"
+        "- Members reporting life-changing profits\n"
+        "- <b>$350 VALUE - FREE ACCESS ENDING THIS WEEK!</b>\n\n"
+        "<b>💰 COPYTRADE SYSTEM - FINAL OPPORTUNITY</b>\n"
+        "- Passive income without doing the work\n"
+        "- Current members: $500-$2500 weekly profits\n"
+        "- Zero learning curve - 100% automated\n"
+        "- <b>$500 VALUE - NEVER FREE AGAIN AFTER THIS WEEK</b>\n\n"
+        "<b>💎 PREMIUM VIP + EA TRADING BOT - 5 SPOTS REMAINING</b>\n"
+        "- Our most elite package (highest ROI)\n"
+        "- Proven: +40.36% FX &amp; +19.41% GOLD last month\n"
+        "- Exclusive strategies not shared publicly\n"
+        "- <b>PRICE INCREASING 30% NEXT WEEK - LOCK IN NOW!</b>\n\n"
+        "<b>⏰ WHICH ELITE OPPORTUNITY WILL YOU SECURE TODAY?</b>"
+    ),
+}
+
+class _StaticKeyboard(InlineKeyboardMarkup):
+    """Inline keyboard that is converted for the Bot API once, for markups that are never changed."""
+    __slots__ = ('_api_dict',)
+    
+    def __init__(self, inline_keyboard):
+        super().__init__(inline_keyboard)
+        with self._unfrozen():
+            self._api_dict = super().to_dict()
+    
+    def to_dict(self, recursive: bool = True):
+        """Return the dict built at construction instead of walking the buttons again."""
+        return self._api_dict if recursive else super().to_dict(recursive)
+
+# Welcome keyboards are static, so they are built once at import
+# Offer rows shared by the focused welcome keyboards
+_WELCOME_OFFER_ROWS = (
+    (InlineKeyboardButton("🚀 X10 CHALLENGE - 17 SLOTS LEFT!", callback_data='special_challenge'),),
+    (InlineKeyboardButton("💰 COPYTRADE - FINAL FREE OFFER", callback_data='copytrade_lifetime'),),
+    (InlineKeyboardButton("💎 PREMIUM VIP SIGNAL + EA BOT - 5 SPOTS", callback_data='premium_vip_ea'),),
+)
+
+_WELCOME_KBS = {
+    'regular': _StaticKeyboard([
         [InlineKeyboardButton("🔥 X10 Challenge (ONLY 17 SLOTS LEFT)", callback_data="special_challenge")],
         [InlineKeyboardButton("💰 Copytrade (FINAL FREE OFFER)", callback_data="copytrade_lifetime")],
         [InlineKeyboardButton("💎 Premium VIP Signal + EA Bot (5 SPOTS)", callback_data="premium_vip_ea")]
-    ]
+    ]),
+    'ea': _StaticKeyboard(_WELCOME_OFFER_ROWS + (
+        (InlineKeyboardButton("📊 VIEW LIVE RESULTS - 94% WIN RATE", callback_data='ea_results'),),
+    )),
+    'signal': _StaticKeyboard(_WELCOME_OFFER_ROWS + (
+        (InlineKeyboardButton("📊 VIEW 94% WIN RATE PROOF", callback_data='signal_results'),),
+    )),
+    'vip': _StaticKeyboard(_WELCOME_OFFER_ROWS + (
+        (InlineKeyboardButton("🔒 EXCLUSIVE VIP BENEFITS", callback_data='vip_benefits'),),
+    )),
+}
+
+# Testimonial service and the chance of scheduling a testimonial after each welcome
+_WELCOME_TESTIMONIALS = {
+    'regular': ('general', 0.5),
+    'ea': ('ea', 0.4),
+    'signal': ('signal', 0.4),
+    'vip': ('vip', 0.4),
+}
+
+async def _send_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE, variant: str, edit: bool = False) -> None:
+    """Send the welcome message of the given variant and maybe schedule a testimonial.
+    
+    With edit=True the clicked message is turned into the welcome instead of sending a new one.
+    """
+    message = _WELCOME_TEXT[variant]
+    reply_markup = _WELCOME_KBS[variant]
+    
+    # Get chat ID safely
+    chat = update.effective_chat
+    chat_id = None
+    if chat:
+        chat_id = chat.id
+    elif update.callback_query and update.callback_query.message:
+        chat_id = update.callback_query.message.chat_id
     
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    if not chat_id:
+        logger.error(f"Could not determine chat ID for {variant} welcome message")
+        return
     
+    query = update.callback_query
     try:
-        # Send welcome message
-        if not message:
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text=welcome_text,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
+        # Try to send message
+        if edit and query and query.message:
+            await _edit_or_replace(query, context, message, reply_markup)
+        elif update.message:
+            await update.message.reply_text(message, reply_markup=reply_markup)
         else:
-            try:
-                await message.reply_text(
-                    welcome_text,
-                    reply_markup=reply_markup,
-                    parse_mode='Markdown'
-                )
-            except Exception as e:
-                logger.error(f"Error replying to message: {str(e)}")
-                # Fallback to sending new message
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=welcome_text,
-                    reply_markup=reply_markup,
-                    parse_mode='Markdown'
-                )
+            await context.bot.send_message(chat_id=chat_id, text=message, reply_markup=reply_markup)
         
-        # 50% chance to send a testimonial after welcome
-        if random.random() < 0.5:  # 50% chance
+        # Sometimes follow the welcome with a testimonial
+        service, chance = _WELCOME_TESTIMONIALS[variant]
+        if _want_testimonial(chance):
             # Schedule testimonial to be sent after 3-5 seconds
             delay = random.randint(3, 5)
             try:
-                context.job_queue.run_once(
-                    lambda ctx: send_testimonial_to_user(ctx, chat_id, 'general'),
-                    delay,
-                    name=f"welcome_testimonial_{chat_id}"
-                )
-                logger.info(f"Scheduled welcome testimonial for user {chat_id} with delay {delay}s")
+                if schedule_testimonial(context.job_queue, chat_id, service, delay, f"welcome_testimonial_{chat_id}"):
+                    logger.debug(f"Scheduled {variant} welcome testimonial for user {chat_id} with delay {delay}s")
             except Exception as e:
-                logger.error(f"Error scheduling welcome testimonial: {str(e)}")
+                logger.error(f"Error scheduling {variant} welcome testimonial: {str(e)}")
                 
     except Exception as e:
-        logger.error(f"Error sending welcome message: {str(e)}")
-
-async def ea_focused_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """EA-focused welcome for users coming from EA ads."""
-    keyboard = [
-        [InlineKeyboardButton("🚀 X10 CHALLENGE - 17 SLOTS LEFT!", callback_data='special_challenge')],
-        [InlineKeyboardButton("💰 COPYTRADE - FINAL FREE OFFER", callback_data='copytrade_lifetime')],
-        [InlineKeyboardButton("💎 PREMIUM VIP SIGNAL + EA BOT - 5 SPOTS", callback_data='premium_vip_ea')],
-        [InlineKeyboardButton("📊 VIEW LIVE RESULTS - 94% WIN RATE", callback_data='ea_results')],
-    ]
+        logger.error(f"Error sending {variant} welcome message: {str(e)}")
+        # Try fallback
+        try:
+            await context.bot.send_message(chat_id=chat_id, text=message, reply_markup=reply_markup)
+        except Exception as inner_e:
+            logger.error(f"Fallback message also failed: {str(inner_e)}")
 
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Get chat ID safely
-    chat_id = None
-    if update.effective_chat:
-        chat_id = update.effective_chat.id
-    elif update.callback_query and update.callback_query.message:
-        chat_id = update.callback_query.message.chat_id
-    
-    if not chat_id:
-        logger.error("Could not determine chat ID for EA focused welcome message")
-        return
-        
-    message = (
-        "*🔥 EXCLUSIVE ACCESS: TNETC PREMIUM TRADING SYSTEMS 🔥*\n\n"
-        "You're among the select few to access our elite trading solutions that most traders will NEVER discover.\n\n"
-        "*⚠️ TIME-SENSITIVE OPPORTUNITIES:*\n\n"
-        "*🚀 X10 CHALLENGE - 83% SOLD OUT!*\n"
-        "- Only 17 of 100 slots remaining\n"
-        "- Our last challenge: 10X in JUST 66 days\n"
-        "- Members reporting life-changing gains\n"
-        "- *$350 VALUE - FREE ACCESS CLOSING THIS WEEK!*\n\n"
-        "*💰 COPYTRADE SYSTEM - FINAL OFFER EVER*\n"
-        "- Set & forget account growth (we trade for you)\n"
-        "- Current members earning $500-$2500/week\n"
-        "- Zero experience needed - 100% automated\n"
-        "- *$500 VALUE - LIFETIME FREE ACCESS ENDING SOON*\n\n"
-        "*💎 PREMIUM VIP + EA TRADING BOT - ALMOST FULL*\n"
-        "- Our most powerful system (80% win rate)\n"
-        "- Last month: FX +40.36% | GOLD +19.41%\n"
-        "- Members consistently outperforming the market\n"
-        "- *ONLY 5 SPOTS LEFT at current pricing!*\n\n"
-        "*⏰ WHICH OPPORTUNITY WILL YOU CLAIM BEFORE IT'S GONE?*"
-    )
-    
+async def _safe_delete(query) -> None:
+    """Delete the message a callback query came from, if it still exists."""
     try:
-        # Try to send message
-        if update.message:
-            await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
-        else:
-            await context.bot.send_message(chat_id=chat_id, text=message, reply_markup=reply_markup, parse_mode='Markdown')
-            
-        # 40% chance to send a testimonial after welcome
-        if random.random() < 0.4:  # 40% chance
-            # Schedule testimonial to be sent after 3-5 seconds
-            delay = random.randint(3, 5)
-            try:
-                context.job_queue.run_once(
-                    lambda ctx: send_testimonial_to_user(ctx, chat_id, 'ea'),
-                    delay,
-                    name=f"welcome_testimonial_{chat_id}"
-                )
-                logger.info(f"Scheduled EA focused welcome testimonial for user {chat_id}")
-            except Exception as e:
-                logger.error(f"Error scheduling EA welcome testimonial: {str(e)}")
-                
+        if query.message:
+            await query.message.delete()
     except Exception as e:
-        logger.error(f"Error sending EA focused welcome message: {str(e)}")
-        # Try fallback
-        try:
-            await context.bot.send_message(chat_id=chat_id, text=message, reply_markup=reply_markup, parse_mode='Markdown')
-        except Exception as inner_e:
-            logger.error(f"Fallback message also failed: {str(inner_e)}")
-
-async def signal_focused_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Signal-focused welcome for users coming from signal ads."""
-    keyboard = [
-        [InlineKeyboardButton("🚀 X10 CHALLENGE - 17 SLOTS LEFT!", callback_data='special_challenge')],
-        [InlineKeyboardButton("💰 COPYTRADE - FINAL FREE OFFER", callback_data='copytrade_lifetime')],
-        [InlineKeyboardButton("💎 PREMIUM VIP SIGNAL + EA BOT - 5 SPOTS", callback_data='premium_vip_ea')],
-        [InlineKeyboardButton("📊 VIEW 94% WIN RATE PROOF", callback_data='signal_results')],
-    ]
+        logger.debug(f"Error deleting message: {str(e)}")
 
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Get chat ID safely
-    chat_id = None
-    if update.effective_chat:
-        chat_id = update.effective_chat.id
-    elif update.callback_query and update.callback_query.message:
-        chat_id = update.callback_query.message.chat_id
-    
-    if not chat_id:
-        logger.error("Could not determine chat ID for Signal focused welcome message")
+async def _edit_or_replace(query, context, text, reply_markup) -> None:
+    """Edit the clicked message in place, replacing it when Telegram refuses the edit."""
+    # Other users' copies of a static screen are made from this message, so it must keep its text
+    if _is_static_source(query.message):
+        await context.bot.send_message(chat_id=query.message.chat_id, text=text, reply_markup=reply_markup)
         return
-        
-    message = (
-        "*🚨 URGENT: TNETC SIGNAL SERVICE - LIMITED ACCESS 🚨*\n\n"
-        "You're viewing our ELITE signal service that most retail traders will never discover (94% win rate).\n\n"
-        "*⚠️ ACT FAST - LIMITED OPPORTUNITIES:*\n\n"
-        "*🚀 X10 CHALLENGE - NEARLY SOLD OUT!*\n"
-        "- Only 17 slots remaining (83% already claimed)\n"
-        "- Previous members: 10X gains in just 66 days\n"
-        "- Proven strategy with verifiable results\n"
-        "- *$350 VALUE - FREE ACCESS ENDS THIS WEEK!*\n\n"
-        "*💰 COPYTRADE SYSTEM - LAST CHANCE EVER*\n"
-        "- Hands-free profits (we trade for you)\n"
-        "- Current members earning $500-$2500 weekly\n"
-        "- 100% automated - no experience required\n"
-        "- *$500 VALUE - LIFETIME FREE ACCESS CLOSING SOON*\n\n"
-        "*💎 PREMIUM VIP SIGNAL + EA BOT - 5 SPOTS LEFT*\n"
-        "- Our most powerful combo (highest returns)\n"
-        "- Last month: +40.36% on FX, +19.41% on GOLD\n"
-        "- Members consistently outperforming markets\n"
-        "- *PRICE INCREASING NEXT WEEK - LAST CHANCE!*\n\n"
-        "*⏰ DON'T MISS OUT - THESE OFFERS EXPIRE SOON!*"
-    )
     
     try:
-        # Try to send message
-        if update.message:
-            await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
-        else:
-            await context.bot.send_message(chat_id=chat_id, text=message, reply_markup=reply_markup, parse_mode='Markdown')
-            
-        # 40% chance to send a testimonial after welcome
-        if random.random() < 0.4:  # 40% chance
-            # Schedule testimonial to be sent after 3-5 seconds
-            delay = random.randint(3, 5)
-            try:
-                context.job_queue.run_once(
-                    lambda ctx: send_testimonial_to_user(ctx, chat_id, 'signal'),
-                    delay,
-                    name=f"welcome_testimonial_{chat_id}"
-                )
-                logger.info(f"Scheduled Signal focused welcome testimonial for user {chat_id}")
-            except Exception as e:
-                logger.error(f"Error scheduling Signal welcome testimonial: {str(e)}")
-                
-    except Exception as e:
-        logger.error(f"Error sending Signal focused welcome message: {str(e)}")
-        # Try fallback
-        try:
-            await context.bot.send_message(chat_id=chat_id, text=message, reply_markup=reply_markup, parse_mode='Markdown')
-        except Exception as inner_e:
-            logger.error(f"Fallback message also failed: {str(inner_e)}")
-
-async def vip_focused_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """VIP-focused welcome for users coming from VIP ads."""
-    keyboard = [
-        [InlineKeyboardButton("🚀 X10 CHALLENGE - 17 SLOTS LEFT!", callback_data='special_challenge')],
-        [InlineKeyboardButton("💰 COPYTRADE - FINAL FREE OFFER", callback_data='copytrade_lifetime')],
-        [InlineKeyboardButton("💎 PREMIUM VIP SIGNAL + EA BOT - 5 SPOTS", callback_data='premium_vip_ea')],
-        [InlineKeyboardButton("🔒 EXCLUSIVE VIP BENEFITS", callback_data='vip_benefits')],
-    ]
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    except BadRequest as e:
+        # Already showing this text, nothing to do
+        if "not modified" in str(e):
+            return
+        
+        # Photos and other non-text messages cannot be edited into text
+        logger.debug(f"Replacing message instead of editing it: {str(e)}")
+        await _safe_delete(query)
+        await context.bot.send_message(
+            chat_id=query.message.chat_id,
+            text=text,
+            reply_markup=reply_markup
+        )
 
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Get chat ID safely
-    chat_id = None
-    if update.effective_chat:
-        chat_id = update.effective_chat.id
-    elif update.callback_query and update.callback_query.message:
-        chat_id = update.callback_query.message.chat_id
-    
-    if not chat_id:
-        logger.error("Could not determine chat ID for VIP focused welcome message")
+async def regular_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE, edit: bool = False) -> None:
+    """Send a detailed welcome message with all service options."""
+    if not (update.message or update.callback_query):
+        logger.error("Cannot identify message or user in regular_welcome")
         return
-        
-    message = (
-        "*💎 EXCLUSIVE: TNETC VIP INNER CIRCLE - BY INVITATION ONLY 💎*\n\n"
-        "You've been granted access to our ELITE trading community that only the top 1% of traders ever discover.\n\n"
-        "*⚠️ URGENT - FINAL ROUND OF OPPORTUNITIES:*\n\n"
-        "*🚀 X10 CHALLENGE - 83% FILLED!*\n"
-        "- Just 17 slots remain from original 100\n"
-        "- Previous challenge: 10X return in 66 days\n"
-        "- Members reporting life-changing profits\n"
-        "- *$350 VALUE - FREE ACCESS ENDING THIS WEEK!*\n\n"
-        "*💰 COPYTRADE SYSTEM - FINAL OPPORTUNITY*\n"
-        "- Passive income without doing the work\n"
-        "- Current members: $500-$2500 weekly profits\n"
-        "- Zero learning curve - 100% automated\n"
-        "- *$500 VALUE - NEVER FREE AGAIN AFTER THIS WEEK*\n\n"
-        "*💎 PREMIUM VIP + EA TRADING BOT - 5 SPOTS REMAINING*\n"
-        "- Our most elite package (highest ROI)\n"
-        "- Proven: +40.36% FX & +19.41% GOLD last month\n"
-        "- Exclusive strategies not shared publicly\n"
-        "- *PRICE INCREASING 30% NEXT WEEK - LOCK IN NOW!*\n\n"
-        "*⏰ WHICH ELITE OPPORTUNITY WILL YOU SECURE TODAY?*"
-    )
     
-    try:
-        # Try to send message
-        if update.message:
-            await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
-        else:
-            await context.bot.send_message(chat_id=chat_id, text=message, reply_markup=reply_markup, parse_mode='Markdown')
-            
-        # 40% chance to send a testimonial after welcome
-        if random.random() < 0.4:  # 40% chance
-            # Schedule testimonial to be sent after 3-5 seconds
-            delay = random.randint(3, 5)
-            try:
-                context.job_queue.run_once(
-                    lambda ctx: send_testimonial_to_user(ctx, chat_id, 'vip'),
-                    delay,
-                    name=f"welcome_testimonial_{chat_id}"
-                )
-                logger.info(f"Scheduled VIP focused welcome testimonial for user {chat_id}")
-            except Exception as e:
-                logger.error(f"Error scheduling VIP welcome testimonial: {str(e)}")
-                
-    except Exception as e:
-        logger.error(f"Error sending VIP focused welcome message: {str(e)}")
-        # Try fallback
-        try:
-            await context.bot.send_message(chat_id=chat_id, text=message, reply_markup=reply_markup, parse_mode='Markdown')
-        except Exception as inner_e:
-            logger.error(f"Fallback message also failed: {str(inner_e)}")
+    # Log user interaction in the background, this also saves new users and changed profiles
+    _in_background(log_user_interaction(update, "welcome", {"source": "regular"}))
+    
+    await _send_welcome(update, context, 'regular', edit)
+
+async def ea_focused_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE, edit: bool = False) -> None:
+    """EA-focused welcome for users coming from EA ads."""
+    await _send_welcome(update, context, 'ea', edit)
+
+async def signal_focused_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE, edit: bool = False) -> None:
+    """Signal-focused welcome for users coming from signal ads."""
+    await _send_welcome(update, context, 'signal', edit)
+
+async def vip_focused_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE, edit: bool = False) -> None:
+    """VIP-focused welcome for users coming from VIP ads."""
+    await _send_welcome(update, context, 'vip', edit)
 
 async def ea_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send the EA-focused welcome message."""
     # For consistency with the new structure, just redirect to ea_focused_welcome
     await ea_focused_welcome(update, context)
 
+# X10 challenge offer shown from the welcome keyboards
+_CHALLENGE_TEXT = (
+    "<b>🔥 X10 CHALLENGE - FINAL 17 SPOTS AVAILABLE! 🔥</b>\n\n"
+    "<b>⚠️ WARNING: This offer is closing THIS WEEK ⚠️</b>\n\n"
+    "Our exclusive X10 Challenge has helped members achieve incredible results:\n\n"
+    "✅ Previous challenge: <b>10X account growth in just 66 days</b>\n"
+    "✅ Members reporting $500-$3,000+ profits weekly\n"
+    "✅ Step-by-step guidance from professional traders\n"
+    "✅ Proven strategy with 94% win rate\n\n"
+    "<b>WHAT YOU GET:</b>\n"
+    "• Access to exclusive challenge group\n"
+    "• Premium signals (not available elsewhere)\n"
+    "• 1-on-1 strategy coaching\n"
+    "• Daily trade opportunities\n\n"
+    "<b>ORIGINAL PRICE: $350</b>\n"
+    "<b>CURRENT PRICE: $0 (FREE)</b>\n\n"
+    "<b>⏰ ONLY 17 SPOTS REMAIN - OFFER ENDS THIS WEEK!</b>\n"
+    "Our last batch of members filled within 24 hours. Don't miss this opportunity!"
+)
+
+_CHALLENGE_FALLBACK_TEXT = (
+    "<b>🔥 X10 CHALLENGE - FINAL 17 SPOTS AVAILABLE! 🔥</b>\n\n"
+    "<b>Sorry, we couldn't update the message. Please click the button again or contact support if this persists.</b>"
+)
+
+_CHALLENGE_KB = _StaticKeyboard([
+    [InlineKeyboardButton("🚀 CLAIM MY SPOT NOW (17 LEFT)", url="https://t.me/tnetccommunity/186")],
+    [InlineKeyboardButton("📱 Contact Support", url='https://t.me/m/1Q0AzxOLNDY1')],
+    [InlineKeyboardButton("⏱️ VIEW PREVIOUS CHALLENGE RESULTS", callback_data="ea_results")],
+    [InlineKeyboardButton("« BACK TO ALL SERVICES", callback_data="show_all_services")]
+])
+
+# Copytrade lifetime offer
+_COPYTRADE_TEXT = (
+    "<b>🔥 TNETC Copytrade Plan - FREE! 🔥</b>\n\n"
+    "Our Copytrade Plan is perfect for those who want to earn from trading without having to trade themselves.\n\n"
+    "<b>What's Included:</b>\n"
+    "✅ Copy trade us on Puprime - we handle everything\n"
+    "✅ 1-on-1 account setup support\n"
+    "✅ Weekly performance reports\n"
+    "✅ Perfect for beginners - no trading knowledge needed\n\n"
+    "<b>Limited Time Offer:</b>\n"
+    "• Regular Price: $500 (lifetime access)\n"
+    "• Current Promotion: FREE!\n\n"
+    "To get started with our Copytrade Plan, contact our support team using the button below."
+)
+
+_COPYTRADE_KB = _StaticKeyboard([
+    [InlineKeyboardButton("📱 Contact Support", url='https://t.me/m/KAYFGGyMYzk1')],
+    [InlineKeyboardButton("📊 View Profit Proof", callback_data='copytrade_profit_proof')],
+    [InlineKeyboardButton("🔙 Back to Plans", callback_data='show_all_services')]
+])
+
+async def send_challenge_details(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send the X10 challenge offer and schedule a follow-up."""
+    query = update.callback_query
+    reply_markup = _CHALLENGE_KB
+    
+    try:
+        if query.message:
+            await _edit_or_replace(query, context, _CHALLENGE_TEXT, reply_markup)
+        else:
+            # Fallback if message is too old
+            await _reply(update, _CHALLENGE_TEXT, reply_markup)
+        
+        # Schedule follow-up
+        await schedule_user_followup(update, context, 'challenge')
+        
+    except Exception as e:
+        logger.error(f"Error sending special challenge info: {str(e)}")
+        await _reply(update, _CHALLENGE_FALLBACK_TEXT, reply_markup)
+
+async def send_copytrade_details(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send the copytrade lifetime offer and schedule a follow-up."""
+    await _reply(update, _COPYTRADE_TEXT, _COPYTRADE_KB)
+    
+    # Schedule follow-up
+    await schedule_user_followup(update, context, 'copytrade')
+
+# Fire-and-forget tasks, referenced until done so they aren't garbage collected
+_background_tasks = set()
+
+async def _answer_quietly(query, **kwargs):
+    """Answer a callback query, logging instead of raising on failure."""
+    try:
+        await query.answer(**kwargs)
+    except TelegramError as e:
+        logger.debug(f"Answering callback query failed: {str(e)}")
+
+def _background_task_done(task):
+    """Release a finished background task and log what it raised."""
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task failed: {str(task.exception())}")
+
+def _in_background(coro):
+    """Run a coroutine without waiting for it, keeping a reference until it finishes."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_task_done)
+    return task
+
+def _answer_in_background(query, **kwargs):
+    """Answer a callback query without waiting for Telegram's response."""
+    _in_background(_answer_quietly(query, **kwargs))
+
+# (user_id, callback data) of static screens sent within the last STATIC_SCREEN_COOLDOWN seconds
+_recent_screens = TTLCache(maxsize=50000, ttl=STATIC_SCREEN_COOLDOWN)
+
 async def button_click(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle button clicks from inline keyboards."""
     query = update.callback_query
     
     try:
-        await query.answer()
-        data = query.data
+        # Interned so the dispatch table lookups hit the identity fast path
+        data = sys.intern(query.data) if query.data else ''
+        handler, testimonial_service, followup_service, debounced = _button_route(data)
+        
+        # Ignore a double tap on a static screen that was just sent to this user
+        if debounced:
+            screen_key = (update.effective_user.id, data)
+            if screen_key in _recent_screens:
+                _answer_in_background(query, cache_time=STATIC_SCREEN_COOLDOWN)
+                return
+            _recent_screens[screen_key] = True
         
-        # Handle the different callback data
-        log_user_interaction(update, "button_click", {
-            "selection": data,
-            "button_click_time": datetime.now().isoformat()
-        })
+        # Clear the button's loading spinner while the click is handled
+        _answer_in_background(query)
+        
+        # Analytics are written in the background so they don't delay the reply, the
+        # click time is taken now so the row's timestamp doesn't depend on when that runs
+        _in_background(log_user_interaction(update, "button_click", {"selection": data}, now=int(time.time())))
         
         # Check if message is available (not too old)
         if query.message is None:
             logger.warning(f"Message is no longer available for callback {data}")
-            # For navigation handlers, we need to handle the case where the message is None
-            if data == 'show_all_services':
-                await regular_welcome(update, context)
-                return
-            elif data == 'back_to_ea_welcome':
-                await ea_focused_welcome(update, context)
-                return
-            elif data == 'back_to_signal_welcome':
-                await signal_focused_welcome(update, context)
-                return
-            elif data == 'back_to_vip_welcome':
-                await vip_focused_welcome(update, context)
-                return
-            elif data == 'back_to_ea_funnel':
-                await ea_focused_welcome(update, context)
-                return
-
-        # Handle premium VIP with EA option
-        if data == 'premium_vip_ea':
-            await send_premium_vip_ea_details(update, context)
-            # Schedule follow-up
-            schedule_user_followup(update, context, 'vip_ea')
-            
-        # Handle specific plan selections
-        elif data == 'special_challenge':
-            keyboard = [
-                [InlineKeyboardButton("🚀 CLAIM MY SPOT NOW (17 LEFT)", url="https://t.me/tnetccommunity/186")],
-                [InlineKeyboardButton("📱 Contact Support", url='https://t.me/m/1Q0AzxOLNDY1')],
-                [InlineKeyboardButton("⏱️ VIEW PREVIOUS CHALLENGE RESULTS", callback_data="ea_results")],
-                [InlineKeyboardButton("« BACK TO ALL SERVICES", callback_data="show_all_services")]
-            ]
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            try:
-                if query.message:
-                    await query.message.edit_text(
-                        "*🔥 X10 CHALLENGE - FINAL 17 SPOTS AVAILABLE! 🔥*\n\n"
-                        "*⚠️ WARNING: This offer is closing THIS WEEK ⚠️*\n\n"
-                        "Our exclusive X10 Challenge has helped members achieve incredible results:\n\n"
-                        "✅ Previous challenge: *10X account growth in just 66 days*\n"
-                        "✅ Members reporting $500-$3,000+ profits weekly\n"
-                        "✅ Step-by-step guidance from professional traders\n"
-                        "✅ Proven strategy with 94% win rate\n\n"
-                        "*WHAT YOU GET:*\n"
-                        "• Access to exclusive challenge group\n"
-                        "• Premium signals (not available elsewhere)\n"
-                        "• 1-on-1 strategy coaching\n"
-                        "• Daily trade opportunities\n\n"
-                        "*ORIGINAL PRICE: $350*\n"
-                        "*CURRENT PRICE: $0 (FREE)*\n\n"
-                        "*⏰ ONLY 17 SPOTS REMAIN - OFFER ENDS THIS WEEK!*\n"
-                        "Our last batch of members filled within 24 hours. Don't miss this opportunity!",
-                        reply_markup=reply_markup,
-                        parse_mode='Markdown'
-                    )
-                else:
-                    # Fallback if message is too old
-                    chat_id = update.effective_chat.id
-                    await context.bot.send_message(
-                        chat_id=chat_id,
-                        text="*🔥 X10 CHALLENGE - FINAL 17 SPOTS AVAILABLE! 🔥*\n\n"
-                        "*⚠️ WARNING: This offer is closing THIS WEEK ⚠️*\n\n"
-                        "Our exclusive X10 Challenge has helped members achieve incredible results:\n\n"
-                        "✅ Previous challenge: *10X account growth in just 66 days*\n"
-                        "✅ Members reporting $500-$3,000+ profits weekly\n"
-                        "✅ Step-by-step guidance from professional traders\n"
-                        "✅ Proven strategy with 94% win rate\n\n"
-                        "*WHAT YOU GET:*\n"
-                        "• Access to exclusive challenge group\n"
-                        "• Premium signals (not available elsewhere)\n"
-                        "• 1-on-1 strategy coaching\n"
-                        "• Daily trade opportunities\n\n"
-                        "*ORIGINAL PRICE: $350*\n"
-                        "*CURRENT PRICE: $0 (FREE)*\n\n"
-                        "*⏰ ONLY 17 SPOTS REMAIN - OFFER ENDS THIS WEEK!*\n"
-                        "Our last batch of members filled within 24 hours. Don't miss this opportunity!",
-                        reply_markup=reply_markup,
-                        parse_mode='Markdown'
-                    )
-                
-                # Schedule follow-up
-                schedule_user_followup(update, context, 'challenge')
-                
-            except Exception as e:
-                logger.error(f"Error sending special challenge info: {str(e)}")
-                # Try fallback message
-                try:
-                    chat_id = update.effective_chat.id
-                    await context.bot.send_message(
-                        chat_id=chat_id,
-                        text="*🔥 X10 CHALLENGE - FINAL 17 SPOTS AVAILABLE! 🔥*\n\n"
-                        "*Sorry, we couldn't update the message. Please click the button again or contact support if this persists.*",
-                        reply_markup=reply_markup,
-                        parse_mode='Markdown'
-                    )
-                except Exception as inner_e:
-                    logger.error(f"Fallback message also failed: {str(inner_e)}")
-                    
-        elif data == 'copytrade_lifetime':
-            # Special handling for copytrade lifetime plan
-            keyboard = [
-                [InlineKeyboardButton("📱 Contact Support", url='https://t.me/m/KAYFGGyMYzk1')],
-                [InlineKeyboardButton("📊 View Profit Proof", callback_data='copytrade_profit_proof')],
-                [InlineKeyboardButton("🔙 Back to Plans", callback_data='show_all_services')]
-            ]
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            message = (
-                "*🔥 TNETC Copytrade Plan - FREE! 🔥*\n\n"
-                "Our Copytrade Plan is perfect for those who want to earn from trading without having to trade themselves.\n\n"
-                "*What's Included:*\n"
-                "✅ Copy trade us on Puprime - we handle everything\n"
-                "✅ 1-on-1 account setup support\n"
-                "✅ Weekly performance reports\n"
-                "✅ Perfect for beginners - no trading knowledge needed\n\n"
-                "*Limited Time Offer:*\n"
-                "• Regular Price: $500 (lifetime access)\n"
-                "• Current Promotion: FREE!\n\n"
-                "To get started with our Copytrade Plan, contact our support team using the button below."
-            )
-            
-            try:
-                if query.message:
-                    await query.message.reply_text(
-                        message,
-                        reply_markup=reply_markup,
-                        parse_mode='Markdown'
-                    )
-                else:
-                    # Fallback if message is None
-                    chat_id = update.effective_chat.id
-                    await query.bot.send_message(
-                        chat_id=chat_id,
-                        text=message,
-                        reply_markup=reply_markup,
-                        parse_mode='Markdown'
-                    )
-            except Exception as e:
-                logger.error(f"Error sending copytrade info: {str(e)}")
-                
-            # Schedule follow-up
-            schedule_user_followup(update, context, 'copytrade')
-
-        elif data == 'standard_trial':
-            await send_plan_details(
-                update, 
-                "⭐️ Standard Plan - 1 Week FREE Trial",
-                "Try our Standard Plan free for one week!",
-                "Standard Trial",
-                "7 DAY FREE TRIAL"
-            )
-            # Schedule follow-up
-            schedule_user_followup(update, context, 'standard')
-            
-        elif data == 'standard_monthly':
-            await send_plan_details(
-                update, 
-                "⭐️ Standard Plan - $66/month",
-                "Monthly subscription to our Standard Plan.",
-                "Standard Monthly",
-                "$66/month"
-            )
-            # Schedule follow-up
-            schedule_user_followup(update, context, 'standard')
-            
-        elif data == 'standard_lifetime':
-            await send_plan_details(
-                update, 
-                "⭐️ Standard Plan - $300/lifetime",
-                "Lifetime access to our Standard Plan.",
-                "Standard Lifetime",
-                "$300 one-time"
-            )
-            # Schedule follow-up
-            schedule_user_followup(update, context, 'standard')
-            
-        elif data == 'vip_monthly':
-            await send_plan_details(
-                update, 
-                "⭐️ VIP Plan - $300/month",
-                "Monthly subscription to our premium VIP Plan.",
-                "VIP Monthly",
-                "$300/month"
-            )
-            # Schedule follow-up
-            schedule_user_followup(update, context, 'vip')
-            
-        elif data == 'vip_lifetime':
-            await send_plan_details(
-                update, 
-                "⭐️ VIP Plan - $2000/lifetime",
-                "Lifetime access to our premium VIP Plan.",
-                "VIP Lifetime",
-                "$2000 one-time"
-            )
-            # Schedule follow-up
-            schedule_user_followup(update, context, 'vip')
-            
-        # EA-specific handlers
-        elif data == 'ea_results':
-            await send_ea_results(update, context)
-            
-        elif data == 'ea_stats':
-            await send_ea_performance(update, context)
-            
-        elif data == 'ea_how_works':
-            await send_ea_explanation(update, context)
-            
-        elif data == 'ea_pricing':
-            await send_ea_pricing(update, context)
-            
-        # Signal-specific handlers
-        elif data == 'signal_results':
-            await send_signal_results(update, context)
-            
-        # VIP-specific handlers
-        elif data == 'vip_benefits':
-            await send_vip_benefits(update, context)
-            
-        # Navigation handlers
-        elif data == 'show_all_services':
-            try:
-                if query.message:
-                    await query.message.delete()
-            except Exception as e:
-                logger.error(f"Error deleting message: {str(e)}")
-            await regular_welcome(update, context)
-        elif data == 'back_to_ea_welcome':
-            try:
-                if query.message:
-                    await query.message.delete()
-            except Exception as e:
-                logger.error(f"Error deleting message: {str(e)}")
-            await ea_focused_welcome(update, context)
-        elif data == 'back_to_signal_welcome':
-            try:
-                if query.message:
-                    await query.message.delete()
-            except Exception as e:
-                logger.error(f"Error deleting message: {str(e)}")
-            await signal_focused_welcome(update, context)
-        elif data == 'back_to_vip_welcome':
-            try:
-                if query.message:
-                    await query.message.delete()
-            except Exception as e:
-                logger.error(f"Error deleting message: {str(e)}")
-            await vip_focused_welcome(update, context)
-            await ea_focused_welcome(update, context)
-            
-        # EA purchase handlers
-        elif data.startswith('purchase_'):
-            await handle_purchase_selection(update, context)
-            
-        # Payment confirmation handlers
-        elif data.startswith('payment_made_'):
-            await handle_payment_confirmation(update, context)
-            
-        # Setup guide handlers
-        elif data.startswith('setup_guide_'):
-            await send_setup_guide(update, context)
-            
-        # Follow-up response handlers
-        elif data.startswith('resume_') or data.startswith('followup_'):
-            await handle_followup_response(update, context)
-            
+        
+        if handler is not None:
+            await handler(update, context)
+        
+        if followup_service:
+            await schedule_user_followup(update, context, followup_service)
+        
+        # Testimonials go to the chat of the clicked message, skip them when it is gone
+        if query.message is None:
+            return
+        
         # After handling standard button options, randomly send a testimonial (20% chance)
-        if random.random() < 0.2:  # 20% chance
-            service = None
-            
-            # Try to determine relevant service from the button clicked
-            if "ea" in data:
-                service = "ea"
-            elif "vip" in data:
-                service = "vip"
-            elif "signal" in data:
-                service = "signal"
-            elif "copytrade" in data:
-                service = "copytrade"
-            elif "challenge" in data:
-                service = "challenge"
-            
+        if _want_testimonial(0.2):  # 20% chance
             # Schedule testimonial to be sent 3-5 seconds after the response
             delay = random.randint(3, 5)
-            context.job_queue.run_once(
-                lambda ctx: send_testimonial_to_user(ctx, query.message.chat_id, service),
-                delay,
-                name=f"testimonial_{query.message.chat_id}"
-            )
-            
-            logger.info(f"Scheduled testimonial for user {query.message.chat_id} with delay {delay}s")
+            chat_id = query.message.chat_id
+            if schedule_testimonial(context.job_queue, chat_id, testimonial_service, delay, f"testimonial_{chat_id}"):
+                logger.debug(f"Scheduled testimonial for user {chat_id} with delay {delay}s")
         
     except Exception as e:
         logger.error(f"Error handling button click: {str(e)}")
         try:
-            await query.edit_message_text(
-                "Sorry, there was an error processing your request. Please try again or type /start to restart."
-            )
+            error_text = "Sorry, there was an error processing your request. Please try again or type /start to restart."
+            if query.message is not None and _is_static_source(query.message):
+                # Never overwrite the message static screens are copied from
+                await _reply(update, error_text, parse_mode=None)
+            else:
+                await query.edit_message_text(error_text, parse_mode=None)
         except Exception as inner_e:
             logger.error(f"Failed to send error message: {str(inner_e)}")
 
-async def send_plan_details(update, title, description, plan_code, price):
+async def send_plan_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send the plan card named by the clicked button."""
+    await send_plan_details(update, context, update.callback_query.data)
+
+def _navigation(welcome):
+    """Build a handler that turns the clicked message into the given welcome."""
+    async def navigate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        await welcome(update, context, edit=True)
+    return navigate
+
+async def send_plan_details(update, context, plan_key):
     """Send details about a plan."""
+    text, reply_markup = _PLAN_MESSAGES[plan_key]
+    plan_code = _PLAN_DETAILS[plan_key][2]
+    
     # Check if message is available
     if update.callback_query and update.callback_query.message is None:
         logger.warning(f"Message no longer available for plan_details: {plan_code}")
-        try:
-            # Fallback to sending a new message
-            chat_id = update.effective_chat.id
-            text = create_plan_text(title, description, plan_code, price)
-            reply_markup = create_plan_keyboard(plan_code)
-            
-            await update.callback_query.bot.send_message(
-                chat_id=chat_id, 
-                text=text,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-            return True
-        except Exception as e:
-            logger.error(f"Error sending plan details fallback: {str(e)}")
-            return False
-    
-    text = create_plan_text(title, description, plan_code, price)
-    reply_markup = create_plan_keyboard(plan_code)
+        # Fallback to sending a new message
+        return await _reply(update, text, reply_markup) is not None
     
     try:
         if update.callback_query and update.callback_query.message:
             message = update.callback_query.message
-            await message.edit_text(text=text, reply_markup=reply_markup, parse_mode='Markdown')
+            await _edit_or_replace(update.callback_query, context, text, reply_markup)
             
             # 30% chance to send a testimonial after plan details
-            if random.random() < 0.3:  # 30% chance
+            if _want_testimonial(0.3):  # 30% chance
                 # Send testimonial related to this plan
-                service = None
-                if "ea" in plan_code:
-                    service = "ea"
-                elif "vip" in plan_code:
-                    service = "vip"
-                elif "signal" in plan_code:
-                    service = "signal"
-                elif "copytrade" in plan_code:
-                    service = "copytrade"
-                elif "challenge" in plan_code:
-                    service = "challenge"
+                service = _service_from_data(plan_code)
                 
                 # Schedule testimonial to be sent 2-4 seconds after the plan details
                 delay = random.randint(2, 4)
-                context = update.callback_query._context
-                if context and hasattr(context, 'job_queue') and context.job_queue:
-                    context.job_queue.run_once(
-                        lambda ctx: send_testimonial_to_user(ctx, message.chat_id, service),
-                        delay,
-                        name=f"testimonial_{message.chat_id}"
-                    )
-                    logger.info(f"Scheduled testimonial for user {message.chat_id} with delay {delay}s")
+                if schedule_testimonial(context.job_queue, message.chat_id, service, delay, f"testimonial_{message.chat_id}"):
+                    logger.debug(f"Scheduled testimonial for user {message.chat_id} with delay {delay}s")
             
-            logger.info(f"Plan details sent for {plan_code}")
+            logger.debug(f"Plan details sent for {plan_code}")
             return True
         else:
             logger.error("No message available to update")
             return False
     except Exception as e:
         logger.error(f"Error sending plan details: {str(e)}")
-        try:
-            # Fallback to sending a new message
-            chat_id = update.effective_chat.id
-            await update.callback_query.bot.send_message(
-                chat_id=chat_id,
-                text=text,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-            return True
-        except Exception as inner_e:
-            logger.error(f"Error sending plan details fallback: {str(inner_e)}")
-            return False
+        # Fallback to sending a new message
+        return await _reply(update, text, reply_markup) is not None
+
+# Callback data prefixes followed by a plan or service
+_PURCHASE_PREFIX = 'purchase_'
+_PAYMENT_MADE_PREFIX = 'payment_made_'
+_SETUP_GUIDE_PREFIX = 'setup_guide_'
+_RESUME_PREFIX = 'resume_'
 
 def create_plan_text(title, description, plan_code, price):
     """Create formatted text for a plan."""
     return (
-        f"*{title}*\n\n"
+        f"<b>{title}</b>\n\n"
         f"{description}\n\n"
-        f"*Price: {price}*\n\n"
+        f"<b>Price: {price}</b>\n\n"
         f"To purchase this plan, click the button below."
     )
 
 def create_plan_keyboard(plan_code):
     """Create keyboard with purchase button for a plan."""
     keyboard = [
-        [InlineKeyboardButton("Purchase Now", callback_data=f"purchase_{plan_code}")],
+        [InlineKeyboardButton("Purchase Now", callback_data=f'{_PURCHASE_PREFIX}{plan_code}')],
         [InlineKeyboardButton("« Back to all services", callback_data="show_all_services")]
     ]
-    return InlineKeyboardMarkup(keyboard)
+    return _StaticKeyboard(keyboard)
+
+# Plan cards shown by send_plan_details: key -> (title, description, plan_code, price),
+# where plan_code is the _PLAN_PRICE key bought through the card's purchase button
+_PLAN_DETAILS = {
+    'standard_trial': (
+        "⭐️ Standard Plan - 1 Week FREE Trial",
+        "Try our Standard Plan free for one week!",
+        'standard_trial',
+        "7 DAY FREE TRIAL"
+    ),
+    'standard_monthly': (
+        "⭐️ Standard Plan - $66/month",
+        "Monthly subscription to our Standard Plan.",
+        'standard_monthly',
+        "$66/month"
+    ),
+    'standard_lifetime': (
+        "⭐️ Standard Plan - $300/lifetime",
+        "Lifetime access to our Standard Plan.",
+        'standard_lifetime',
+        "$300 one-time"
+    ),
+    'vip_monthly': (
+        "⭐️ VIP Plan - $300/month",
+        "Monthly subscription to our premium VIP Plan.",
+        'vip_monthly',
+        "$300/month"
+    ),
+    'vip_lifetime': (
+        "⭐️ VIP Plan - $2000/lifetime",
+        "Lifetime access to our premium VIP Plan.",
+        'vip_lifetime',
+        "$2000 one-time"
+    ),
+    'copytrade_lifetime': (
+        "⭐️ Copytrade Plan - $500/lifetime",
+        "Lifetime access to our Copytrade Plan.",
+        'copytrade',
+        "$500 one-time"
+    ),
+}
+
+# Text and keyboard of every plan card, rendered once
+_PLAN_MESSAGES = {
+    key: (create_plan_text(*details), create_plan_keyboard(details[2]))
+    for key, details in _PLAN_DETAILS.items()
+}
+
+# Static message key -> (chat_id, message_id) of a copy already sent by _send_static
+_static_message_sources = {}
+
+def _is_static_source(message):
+    """Tell whether later copies of a static screen are made from this message."""
+    return (message.chat_id, message.message_id) in _static_message_sources.values()
+
+async def _send_static(update: Update, context: ContextTypes.DEFAULT_TYPE, key: str, text: str, reply_markup) -> None:
+    """Send a static message, copying an earlier copy of it server-side when one exists."""
+    chat_id = update.effective_chat.id
+    
+    source = _static_message_sources.get(key)
+    if source is not None:
+        try:
+            await context.bot.copy_message(
+                chat_id=chat_id,
+                from_chat_id=source[0],
+                message_id=source[1],
+                reply_markup=reply_markup
+            )
+            return
+        except TelegramError as e:
+            # The earlier copy was deleted or its chat blocked the bot, send afresh
+            logger.debug(f"Copying static message {key} failed: {str(e)}")
+            _static_message_sources.pop(key, None)
+    
+    message = await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+    _static_message_sources[key] = (message.chat_id, message.message_id)
+
+async def _reply(update: Update, text: str, reply_markup=None, **kwargs):
+    """Send a message to the update's chat, returning None if Telegram rejects it."""
+    chat_id = update.effective_chat.id
+    try:
+        return await update.get_bot().send_message(
+            chat_id=chat_id,
+            text=text,
+            reply_markup=reply_markup,
+            **kwargs
+        )
+    except TelegramError as e:
+        logger.error(f"Error sending message to chat {chat_id}: {str(e)}")
+        return None
+
+async def _reply_long(message, text: str) -> None:
+    """Reply with text split at line breaks into pieces of at most MAX_MESSAGE_LENGTH characters."""
+    chunk = []
+    size = 0
+    for line in text.splitlines(keepends=True):
+        if chunk and size + len(line) > MAX_MESSAGE_LENGTH:
+            await message.reply_text(''.join(chunk))
+            chunk = []
+            size = 0
+        chunk.append(line)
+        size += len(line)
+    
+    if chunk:
+        await message.reply_text(''.join(chunk))
+
+# Performance summary sent by send_ea_results
+_EA_RESULTS_TEXT = (
+    "📊 <b>TNETC TRADING PERFORMANCE RESULTS</b> 📊\n\n"
+    "<b>Monthly Performance (Last 3 Months):</b>\n"
+    "• April: +25.3%\n"
+    "• May: +52.3%\n"
+    "• June: +40.36%\n\n"
+    "<b>Performance by Market:</b>\n"
+    "• Forex: +40.36% ✅\n"
+    "• Gold: +19.41% ✅\n\n"
+    "<b>Key Performance Metrics:</b>\n"
+    "• Win Rate: 80% for EA, 94% for Signals\n"
+    "• Profit Factor: 3.2\n"
+    "• Average Win/Loss Ratio: 3.5\n"
+    "• Maximum Drawdown: 8.3%\n\n"
+    "Get these results with our Premium VIP Signal + EA Trading Bot package or take advantage of our FREE x10 Challenge or Copytrade offers!"
+)
+
+_EA_RESULTS_KB = _StaticKeyboard([
+    [InlineKeyboardButton("💎 Premium VIP Signal + EA Bundle", callback_data='premium_vip_ea')],
+    [InlineKeyboardButton("🔙 Back", callback_data='back_to_ea_welcome')]
+])
 
 async def send_ea_results(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send EA performance results."""
-    keyboard = [
-        [InlineKeyboardButton("💎 Premium VIP Signal + EA Bundle", callback_data='premium_vip_ea')],
-        [InlineKeyboardButton("🔙 Back", callback_data='back_to_ea_welcome')],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    message = (
-        "📊 *TNETC TRADING PERFORMANCE RESULTS* 📊\n\n"
-        "*Monthly Performance (Last 3 Months):*\n"
-        "• April: +25.3%\n"
-        "• May: +52.3%\n"
-        "• June: +40.36%\n\n"
-        "*Performance by Market:*\n"
-        "• Forex: +40.36% ✅\n"
-        "• Gold: +19.41% ✅\n\n"
-        "*Key Performance Metrics:*\n"
-        "• Win Rate: 80% for EA, 94% for Signals\n"
-        "• Profit Factor: 3.2\n"
-        "• Average Win/Loss Ratio: 3.5\n"
-        "• Maximum Drawdown: 8.3%\n\n"
-        "Get these results with our Premium VIP Signal + EA Trading Bot package or take advantage of our FREE x10 Challenge or Copytrade offers!"
-    )
-
     try:
-        if update.callback_query and update.callback_query.message:
-            await update.callback_query.message.reply_text(
-                message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        elif update.message:
-            await update.message.reply_text(
-                message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        else:
-            # Fallback if both are None
-            chat_id = update.effective_chat.id
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
+        await _send_static(update, context, 'ea_results', _EA_RESULTS_TEXT, _EA_RESULTS_KB)
     except Exception as e:
         logger.error(f"Error sending EA results: {str(e)}")
-        # Try one more fallback
-        try:
-            chat_id = update.effective_chat.id
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        except Exception as inner_e:
-            logger.error(f"Fallback message also failed: {str(inner_e)}")
+
+def _followup_message(base_message):
+    """Wrap a service pitch in the follow-up message layout."""
+    return (
+        f"👋 <b>Follow-up from TNETC Trading</b>\n\n"
+        f"{base_message}\n\n"
+        f"Check out what our customers are saying:"
+    )
+
+# service -> follow-up message sent by schedule_followup, rendered once
+_FOLLOWUP_MESSAGES = MappingProxyType({
+    service: _followup_message(base_message)
+    for service, base_message in {
+        'ea': "I noticed you were exploring our EA Trading Bot recently. Our automated system has a proven 80% win rate and has helped many traders achieve consistent profits.",
+        'vip': "I noticed you were checking out our VIP Trading Plan. Our VIP members enjoy exclusive benefits like 1-on-1 signal guidance and higher returns.",
+        'signal': "I noticed you were looking at our Signal Service. Our signals have a 94% win rate and can significantly improve your trading results.",
+        'standard': "I noticed you were exploring our Standard Plan. It's a great way to get started with our premium trading signals and support.",
+        'copytrade': "I noticed you were checking out our Copytrade Plan. It's perfect if you want to earn without having to trade yourself - we handle everything for you.",
+        'challenge': "I noticed you were exploring our x10 Challenge. This exclusive opportunity has helped traders multiply their accounts by 10x in just 66 days.",
+        'vip_ea': "I noticed you were exploring our Premium VIP Signal + EA Trading Bot package. This comprehensive solution gives you the best of both worlds.",
+    }.items()
+})
+_FOLLOWUP_DEFAULT_MESSAGE = _followup_message("I noticed you were exploring our services recently but didn't complete your purchase.")
+
+@lru_cache(maxsize=64)
+def _followup_keyboard(service):
+    """Return the follow-up keyboard for a service, built once per service."""
+    return _StaticKeyboard([
+        [InlineKeyboardButton("Continue Where I Left Off", callback_data=f'{_RESUME_PREFIX}{service}')],
+        [InlineKeyboardButton("I Have Questions", callback_data='followup_questions')],
+        [InlineKeyboardButton("Not Interested", callback_data='followup_not_interested')]
+    ])
 
 async def schedule_followup(context: ContextTypes.DEFAULT_TYPE) -> None:
     """Schedule a follow-up message for users who showed interest but didn't purchase."""
@@ -1352,67 +1683,42 @@ async def schedule_followup(context: ContextTypes.DEFAULT_TYPE) -> None:
     
     user_id = data.get('user_id')
     service = data.get('service')
+    _forget_followup_job(user_id, job.name)
     
     # Check if user has purchased using database
-    if has_purchased(user_id):
+    if await check_purchased(user_id):
         logger.info(f"User {user_id} has already purchased, skipping follow-up")
         return
     
     # Get chat ID
     chat_id = user_id
     
-    # Determine which service the user was interested in
-    service_messages = {
-        'ea': "I noticed you were exploring our EA Trading Bot recently. Our automated system has a proven 80% win rate and has helped many traders achieve consistent profits.",
-        'vip': "I noticed you were checking out our VIP Trading Plan. Our VIP members enjoy exclusive benefits like 1-on-1 signal guidance and higher returns.",
-        'signal': "I noticed you were looking at our Signal Service. Our signals have a 94% win rate and can significantly improve your trading results.",
-        'standard': "I noticed you were exploring our Standard Plan. It's a great way to get started with our premium trading signals and support.",
-        'copytrade': "I noticed you were checking out our Copytrade Plan. It's perfect if you want to earn without having to trade yourself - we handle everything for you.",
-        'challenge': "I noticed you were exploring our x10 Challenge. This exclusive opportunity has helped traders multiply their accounts by 10x in just 66 days.",
-        'vip_ea': "I noticed you were exploring our Premium VIP Signal + EA Trading Bot package. This comprehensive solution gives you the best of both worlds."
-    }
-    
-    base_message = service_messages.get(service, "I noticed you were exploring our services recently but didn't complete your purchase.")
+    # Pick the follow-up text for the service the user was interested in
+    message = _FOLLOWUP_MESSAGES.get(service, _FOLLOWUP_DEFAULT_MESSAGE)
     
-    # Create follow-up message with options
-    message = (
-        f"👋 *Follow-up from TNETC Trading*\n\n"
-        f"{base_message}\n\n"
-        f"Check out what our customers are saying:"
-    )
-    
-    keyboard = [
-        [InlineKeyboardButton("Continue Where I Left Off", callback_data=f'resume_{service}')],
-        [InlineKeyboardButton("I Have Questions", callback_data='followup_questions')],
-        [InlineKeyboardButton("Not Interested", callback_data='followup_not_interested')]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    reply_markup = _followup_keyboard(service)
     
     try:
         # Send initial message
         await context.bot.send_message(
             chat_id=chat_id,
             text=message,
-            reply_markup=reply_markup,
-            parse_mode='Markdown'
+            reply_markup=reply_markup
         )
         
         # Send testimonial images from directory
         try:
-            testimonials = get_random_testimonials(service, 2)
+            testimonials = await asyncio.to_thread(get_random_testimonials, service, 2)
             
             for testimonial in testimonials:
-                img_path = testimonial['image_path']
-                if os.path.exists(img_path):
-                    caption = f"*{testimonial['name']}:* {testimonial['text']}"
-                    with open(img_path, 'rb') as photo:
-                        await context.bot.send_photo(
-                            chat_id=chat_id,
-                            photo=photo,
-                            caption=caption,
-                            parse_mode='Markdown'
-                        )
+                photo = await asyncio.to_thread(read_image, testimonial['image_path'])
+                if photo is not None:
+                    caption = f"<b>{html.escape(testimonial['name'])}:</b> {html.escape(testimonial['text'])}"
+                    await context.bot.send_photo(
+                        chat_id=chat_id,
+                        photo=photo,
+                        caption=caption
+                    )
         
         except Exception as e:
             logger.error(f"Error sending follow-up testimonials: {str(e)}")
@@ -1427,12 +1733,28 @@ async def schedule_followup(context: ContextTypes.DEFAULT_TYPE) -> None:
         # Update follow-up status in database
         update_followup_status(user_id, "failed")
 
-def schedule_user_followup(update: Update, context: ContextTypes.DEFAULT_TYPE, service: str) -> None:
+# user_id -> name -> number of pending follow-up jobs scheduled for that user. Entries go away
+# when the jobs run or are canceled, so users who never buy don't accumulate here
+_user_followup_jobs = defaultdict(Counter)
+
+def _forget_followup_job(user_id, job_name):
+    """Stop tracking one follow-up job that has run."""
+    jobs = _user_followup_jobs.get(user_id)
+    if jobs is None:
+        return
+    
+    jobs[job_name] -= 1
+    if jobs[job_name] <= 0:
+        del jobs[job_name]
+        if not jobs:
+            del _user_followup_jobs[user_id]
+
+async def schedule_user_followup(update: Update, context: ContextTypes.DEFAULT_TYPE, service: str) -> None:
     """Schedule a follow-up for a user who viewed a service but didn't purchase."""
     user_id = update.effective_user.id
     
     # Don't schedule if user has already purchased
-    if has_purchased(user_id):
+    if await check_purchased(user_id):
         return
     
     # Check if job_queue is available
@@ -1440,221 +1762,166 @@ def schedule_user_followup(update: Update, context: ContextTypes.DEFAULT_TYPE, s
         logger.error(f"Job queue is not available for user {user_id}, cannot schedule follow-up")
         return
     
-    # Calculate scheduled date (24 hours later)
-    scheduled_date = (datetime.now() + timedelta(hours=24)).isoformat()
+    # Views of a service whose follow-up is still pending don't queue another one
+    job_name = f"followup_{user_id}_{service}"
+    jobs = _user_followup_jobs.get(user_id, {})
+    if jobs.get(job_name):
+        if context.job_queue.get_jobs_by_name(job_name):
+            return
+        # The job left the queue without running, e.g. skipped as a misfire, so its count is stale
+        del jobs[job_name]
     
     # Record follow-up in database
-    record_followup(user_id, service, scheduled_date)
+    record_followup(user_id, service, int(time.time()) + FOLLOWUP_DELAY)
     
     # Schedule follow-up for 24 hours later
     context.job_queue.run_once(
-        lambda ctx: send_testimonial_to_user(ctx, chat_id, service),
-        timedelta(hours=24),
-        name=f"followup_{user_id}_{service}"
+        schedule_followup,
+        FOLLOWUP_DELAY,
+        data={'user_id': user_id, 'service': service},
+        name=job_name
     )
+    _user_followup_jobs[user_id][job_name] += 1
     
     logger.info(f"Scheduled follow-up for user {user_id} for {service} in 24 hours")
 
+# plan -> (name, price, service) of the plans sold through the purchase screen,
+# taken from the same tables as the recorded purchase so they can't drift apart
+_PURCHASE_PLANS = {
+    plan: (_PLAN_NAMES[plan], _PLAN_PRICE[plan], service)
+    for plan, service in (
+        ('monthly', 'ea'), ('quarterly', 'ea'), ('annual', 'ea'), ('copytrade', 'copytrade'),
+        ('standard_trial', 'standard'), ('standard_monthly', 'standard'), ('standard_lifetime', 'standard'),
+        ('vip_monthly', 'vip'), ('vip_lifetime', 'vip'),
+    )
+}
+
+_PURCHASE_TEMPLATE = (
+    "<b>How to Complete Your {name} Purchase</b>\n\n"
+    "<b>Price: {price}</b>\n\n"
+    "1. Contact our support team with code: <code>EA_{code}_{user_id}</code>\n"
+    "2. Our team will provide payment instructions\n"
+    "3. After payment, you'll receive your EA setup within 24 hours\n\n"
+    "Questions? Our support team is available 24/7."
+)
+
+@lru_cache(maxsize=64)
+def _purchase_details(plan):
+    """Return the user-independent parts of the purchase message for a plan, built once per plan."""
+    name, price, service = _PURCHASE_PLANS.get(plan, (f"{html.escape(plan.capitalize())} Plan", 'Custom Price', 'ea'))
+    return {
+        'name': name,
+        'price': price,
+        'service': service,
+        'code': html.escape(plan.upper()),
+        'markup': _StaticKeyboard([
+            [InlineKeyboardButton("📱 Contact Support", url='https://t.me/m/DvGbHx0NZTFl')],
+            [InlineKeyboardButton("✅ I've Made Payment", callback_data=f'{_PAYMENT_MADE_PREFIX}{plan}')],
+            [InlineKeyboardButton("🔙 Back to Plans", callback_data='ea_pricing')]
+        ]),
+    }
+
 async def handle_purchase_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle when a user selects a plan to purchase."""
     query = update.callback_query
-    await query.answer()
 
-    plan = query.data.replace('purchase_', '')
+    plan = query.data[len(_PURCHASE_PREFIX):]
     
     # Log purchase intent
-    log_user_interaction(update, "purchase_intent", {"plan": plan})
-    
-    # Get plan details
-    plan_details = {
-        'monthly': {'name': 'Monthly EA Plan', 'price': '$200', 'service': 'ea'},
-        'quarterly': {'name': 'Quarterly EA Plan', 'price': '$500', 'service': 'ea'},
-        'annual': {'name': 'Annual EA Plan', 'price': '$1500', 'service': 'ea'},
-        'copytrade': {'name': 'Copytrade Lifetime Plan', 'price': '$500', 'service': 'copytrade'}
-    }
+    _in_background(log_user_interaction(update, "purchase_intent", {"plan": plan}))
     
-    plan_name = plan_details.get(plan, {}).get('name', f"{plan.capitalize()} Plan")
-    plan_price = plan_details.get(plan, {}).get('price', 'Custom Price')
-    service = plan_details.get(plan, {}).get('service', 'ea')
-    
-    # Payment instructions
-    keyboard = [
-        [InlineKeyboardButton("📱 Contact Support", url='https://t.me/m/DvGbHx0NZTFl')],
-        [InlineKeyboardButton("✅ I've Made Payment", callback_data=f'payment_made_{plan}')],
-        [InlineKeyboardButton("🔙 Back to Plans", callback_data='ea_pricing')]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    message = (
-        f"*How to Complete Your {plan_name} Purchase*\n\n"
-        f"*Price: {plan_price}*\n\n"
-        f"1. Contact our support team with code: `EA_{plan.upper()}_{query.from_user.id}`\n"
-        f"2. Our team will provide payment instructions\n"
-        f"3. After payment, you'll receive your EA setup within 24 hours\n\n"
-        f"Questions? Our support team is available 24/7."
-    )
+    # Payment instructions, only the user ID changes between clicks
+    details = _purchase_details(plan)
+    service = details['service']
+    reply_markup = details['markup']
+    message = _PURCHASE_TEMPLATE.format_map({**details, 'user_id': query.from_user.id})
     
     try:
-        if query.message:
-            await query.message.reply_text(
-                message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        else:
-            # Fallback if message is None
-            chat_id = update.effective_chat.id
-            await query.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
+        await _reply(update, message, reply_markup)
         
         # Schedule a follow-up if user doesn't complete purchase
-        schedule_user_followup(update, context, service)
+        await schedule_user_followup(update, context, service)
         
-        # Always send a related testimonial after purchase selection
-        if message:
-            chat_id = message.chat.id
-            # Determine which service was selected
-            service = None
-            if "ea" in plan_code:
-                service = "ea"
-            elif "vip" in plan_code:
-                service = "vip"
-            elif "signal" in plan_code:
-                service = "signal"
-            elif "copytrade" in plan_code:
-                service = "copytrade"
-            elif "challenge" in plan_code:
-                service = "challenge"
-            
-            # Schedule testimonial to be sent 3 seconds after the purchase options
-            context.job_queue.run_once(
-                lambda ctx: send_testimonial_to_user(ctx, chat_id, service),
-                3,  # 3 seconds delay
-                name=f"testimonial_{chat_id}"
-            )
-            
+        # Always send a related testimonial after purchase selection, 3 seconds after the purchase options
+        chat_id = update.effective_chat.id
+        if schedule_testimonial(context.job_queue, chat_id, service, 3, f"testimonial_{chat_id}"):
             logger.info(f"Scheduled purchase testimonial for user {chat_id}")
         
     except Exception as e:
         logger.error(f"Error sending purchase selection info: {str(e)}")
 
+@lru_cache(maxsize=64)
+def _onboarding_keyboard(plan):
+    """Return the keyboard sent after a payment for a plan, built once per plan."""
+    return _StaticKeyboard([
+        [InlineKeyboardButton("📱 Contact Support", url='https://t.me/trump_tnetc_admin')],
+        [InlineKeyboardButton("📚 Setup Guide", callback_data=f'{_SETUP_GUIDE_PREFIX}{plan}')],
+        [InlineKeyboardButton("🏠 Main Menu", callback_data='show_all_services')]
+    ])
+
+@lru_cache(maxsize=64)
+def _payment_confirmation_text(plan):
+    """Return the message sent after a payment for a plan, built once per plan."""
+    plan_name = _PLAN_NAMES.get(plan) or f"{html.escape(plan.capitalize())} Plan"
+    return (
+        f"<b>Thank You for Your {plan_name} Purchase!</b>\n\n"
+        "Your payment confirmation has been received and our team has been notified.\n\n"
+        "<b>Next Steps:</b>\n"
+        "1. Our support team will contact you within 24 hours\n"
+        "2. They will guide you through the setup process\n"
+        "3. You'll receive access to your EA and all included benefits\n\n"
+        "Need immediate assistance? Contact our support team directly."
+    )
+
 async def handle_payment_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle payment confirmation."""
     query = update.callback_query
-    await query.answer()
     
-    plan = query.data.replace('payment_made_', '')
+    plan = query.data[len(_PAYMENT_MADE_PREFIX):]
     
     # Log payment confirmation
-    log_user_interaction(update, "payment_confirmation", {"plan": plan})
+    _in_background(log_user_interaction(update, "payment_confirmation", {"plan": plan}))
     
     # Mark user as having purchased to prevent follow-ups
     user_id = update.effective_user.id
     
-    # Record purchase in database
-    price = "Unknown"
-    if plan == 'monthly':
-        price = "$200"
-    elif plan == 'quarterly':
-        price = "$500"
-    elif plan == 'annual':
-        price = "$1500"
-    elif plan == 'copytrade':
-        price = "$500"
-    elif plan == 'standard_trial':
-        price = "Free Trial"
-    elif plan == 'standard_monthly':
-        price = "$66/month"
-    elif plan == 'standard_lifetime':
-        price = "$300"
-    elif plan == 'vip_monthly':
-        price = "$300/month"
-    elif plan == 'vip_lifetime':
-        price = "$2000"
-    
-    record_purchase(user_id, plan, price)
+    # Price recorded with the purchase
+    price = _PLAN_PRICE.get(plan, "Unknown")
     
     # Update follow-up status in database
     update_followup_status(user_id, "canceled", "user_purchased")
     
     # Cancel any scheduled follow-ups for this user
     if context.job_queue:
-        current_jobs = context.job_queue.get_jobs_by_name(f"followup_{user_id}")
-        for job in current_jobs:
-            job.schedule_removal()
+        for job_name in _user_followup_jobs.pop(user_id, ()):
+            for job in context.job_queue.get_jobs_by_name(job_name):
+                job.schedule_removal()
     else:
-        logger.warning(f"Job queue is not available for user {user_id}, cannot cancel follow-ups")
-    
-    # Get plan details
-    plan_details = {
-        'monthly': {'name': 'Monthly EA Plan'},
-        'quarterly': {'name': 'Quarterly EA Plan'},
-        'annual': {'name': 'Annual EA Plan'},
-        'copytrade': {'name': 'Copytrade Lifetime Plan'},
-        'standard_trial': {'name': 'Standard Trial Plan'},
-        'standard_monthly': {'name': 'Standard Monthly Plan'},
-        'standard_lifetime': {'name': 'Standard Lifetime Plan'},
-        'vip_monthly': {'name': 'VIP Monthly Plan'},
-        'vip_lifetime': {'name': 'VIP Lifetime Plan'}
-    }
-    
-    plan_name = plan_details.get(plan, {}).get('name', f"{plan.capitalize()} Plan")
-    
-    # Onboarding instructions
-    keyboard = [
-        [InlineKeyboardButton("📱 Contact Support", url='https://t.me/trump_tnetc_admin')],
-        [InlineKeyboardButton("📚 Setup Guide", callback_data=f'setup_guide_{plan}')],
-        [InlineKeyboardButton("🏠 Main Menu", callback_data='show_all_services')]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    message = (
-        f"*Thank You for Your {plan_name} Purchase!*\n\n"
-        f"Your payment confirmation has been received and our team has been notified.\n\n"
-        f"*Next Steps:*\n"
-        f"1. Our support team will contact you within 24 hours\n"
-        f"2. They will guide you through the setup process\n"
-        f"3. You'll receive access to your EA and all included benefits\n\n"
-        f"Need immediate assistance? Contact our support team directly."
-    )
-    
-    try:
-        if query.message:
-            await query.message.reply_text(
-                message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        else:
-            # Fallback if message is None
-            chat_id = update.effective_chat.id
-            await query.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-    except Exception as e:
-        logger.error(f"Error sending payment confirmation: {str(e)}")
+        logger.warning(f"Job queue is not available for user {user_id}, cannot cancel follow-ups")
+    
+    # Onboarding instructions
+    reply_markup = _onboarding_keyboard(plan)
+    message = _payment_confirmation_text(plan)
+    
+    # The purchase write and the confirmation don't depend on each other, overlap them
+    await asyncio.gather(
+        asyncio.to_thread(record_purchase, user_id, plan, price),
+        _reply(update, message, reply_markup)
+    )
 
 async def handle_followup_response(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle responses to follow-up messages."""
     query = update.callback_query
-    await query.answer()
     
     response = query.data
     user_id = update.effective_user.id
     
     # Log the follow-up response
-    log_user_interaction(update, "followup_response", {"response": response})
+    _in_background(log_user_interaction(update, "followup_response", {"response": response}))
     
-    if response.startswith('resume_'):
+    if response.startswith(_RESUME_PREFIX):
         # User wants to resume where they left off
-        service = response.replace('resume_', '')
+        service = response[len(_RESUME_PREFIX):]
         
         # Update follow-up status in database
         update_followup_status(user_id, "responded", "resume_service")
@@ -1668,13 +1935,7 @@ async def handle_followup_response(update: Update, context: ContextTypes.DEFAULT
             await signal_focused_welcome(update, context)
         elif service == 'copytrade':
             # For copytrade, show the copytrade plan details
-            await send_plan_details(
-                update, 
-                "⭐️ Copytrade Plan - $500/lifetime",
-                "Lifetime access to our Copytrade Plan.",
-                "Copytrade Lifetime",
-                "$500 one-time"
-            )
+            await send_plan_details(update, context, 'copytrade_lifetime')
         else:
             # Default to regular welcome
             await regular_welcome(update, context)
@@ -1684,14 +1945,9 @@ async def handle_followup_response(update: Update, context: ContextTypes.DEFAULT
         # Update follow-up status in database
         update_followup_status(user_id, "responded", "has_questions")
         
-        keyboard = [
-            [InlineKeyboardButton("📱 Contact Support", url='https://t.me/trump_tnetc_admin')],
-            [InlineKeyboardButton("🏠 Main Menu", callback_data='show_all_services')]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = _SUPPORT_KB
         message = (
-            "*We're Here to Help!*\n\n"
+            "<b>We're Here to Help!</b>\n\n"
             "Our support team is ready to answer any questions you might have about our services.\n\n"
             "Common questions:\n"
             "• How does the EA trading bot work?\n"
@@ -1701,24 +1957,7 @@ async def handle_followup_response(update: Update, context: ContextTypes.DEFAULT
             "Click the button below to chat with our support team directly."
         )
         
-        try:
-            if query.message:
-                await query.message.reply_text(
-                    message,
-                    reply_markup=reply_markup,
-                    parse_mode='Markdown'
-                )
-            else:
-                # Fallback if message is None
-                chat_id = update.effective_chat.id
-                await query.bot.send_message(
-                    chat_id=chat_id,
-                    text=message,
-                    reply_markup=reply_markup,
-                    parse_mode='Markdown'
-                )
-        except Exception as e:
-            logger.error(f"Error sending followup questions response: {str(e)}")
+        await _reply(update, message, reply_markup)
         
     elif response == 'followup_not_interested':
         # User is not interested
@@ -1731,96 +1970,100 @@ async def handle_followup_response(update: Update, context: ContextTypes.DEFAULT
             "Wishing you success in your trading journey! 🚀"
         )
         
-        try:
-            if query.message:
-                await query.message.reply_text(message)
-            else:
-                # Fallback if message is None
-                chat_id = update.effective_chat.id
-                await query.bot.send_message(
-                    chat_id=chat_id,
-                    text=message
-                )
-        except Exception as e:
-            logger.error(f"Error sending followup not interested response: {str(e)}")
+        await _reply(update, message, parse_mode=None)
+
+# Setup guides sent by send_setup_guide
+_COPYTRADE_SETUP_GUIDE = (
+    "<b>TNETC Copytrade Setup Guide</b>\n\n"
+    "<b>Step 1: Create Puprime Account</b>\n"
+    "• Register at Puprime using our referral link\n"
+    "• Complete verification process\n"
+    "• Fund your account (minimum $500 recommended)\n\n"
+    "<b>Step 2: Share Account Details</b>\n"
+    "• Provide your Puprime account number to our support team\n"
+    "• Share your read-only password for monitoring\n"
+    "• Set account leverage (1:100 recommended)\n\n"
+    "<b>Step 3: Confirm Settings</b>\n"
+    "• Confirm risk parameters with our team\n"
+    "• Set account leverage (1:100 recommended)\n\n"
+    "<b>Step 4: Start Earning</b>\n"
+    "• Our team will handle all trading\n"
+    "• You'll receive weekly performance reports\n"
+    "• Monitor your account anytime through Puprime\n\n"
+    "Need help? Our support team is available 24/7."
+)
+
+_EA_SETUP_GUIDE = (
+    "<b>TNETC EA Setup Guide</b>\n\n"
+    "<b>Step 1: Prepare Your Trading Account</b>\n"
+    "• Ensure you have MT4/MT5 installed\n"
+    "• Create/use a funded account (minimum $1000 recommended)\n"
+    "• Set account leverage (1:100 or higher recommended)\n\n"
+    "<b>Step 2: Install the EA</b>\n"
+    "• Our team will provide the EA file\n"
+    "• Follow our installation instructions\n"
+    "• Place EA on correct currency pairs\n\n"
+    "<b>Step 3: Configure Settings</b>\n"
+    "• Set risk per trade (1% recommended)\n"
+    "• Configure trading sessions\n"
+    "• Set maximum open trades\n\n"
+    "<b>Step 4: Monitoring &amp; Support</b>\n"
+    "• Regular performance reviews\n"
+    "• 24/7 technical support\n"
+    "• Strategy updates as market conditions change\n\n"
+    "Need help? Our support team is available 24/7."
+)
+
+# Support contact and main menu, under the setup guides and follow-up questions
+_SUPPORT_KB = _StaticKeyboard([
+    [InlineKeyboardButton("📱 Contact Support", url='https://t.me/trump_tnetc_admin')],
+    [InlineKeyboardButton("🏠 Main Menu", callback_data='show_all_services')]
+])
 
 async def send_setup_guide(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send EA setup guide."""
     query = update.callback_query
-    await query.answer()
     
-    plan = query.data.replace('setup_guide_', '')
+    plan = query.data[len(_SETUP_GUIDE_PREFIX):]
     
     # Log setup guide request
-    log_user_interaction(update, "setup_guide_request", {"plan": plan})
+    _in_background(log_user_interaction(update, "setup_guide_request", {"plan": plan}))
     
     # Different guides based on plan
-    if plan == 'copytrade':
-        guide_text = (
-            "*TNETC Copytrade Setup Guide*\n\n"
-            "*Step 1: Create Puprime Account*\n"
-            "• Register at Puprime using our referral link\n"
-            "• Complete verification process\n"
-            "• Fund your account (minimum $500 recommended)\n\n"
-            "*Step 2: Share Account Details*\n"
-            "• Provide your Puprime account number to our support team\n"
-            "• Share your read-only password for monitoring\n"
-            "• Set account leverage (1:100 recommended)\n\n"
-            "*Step 3: Confirm Settings*\n"
-            "• Confirm risk parameters with our team\n"
-            "• Set account leverage (1:100 recommended)\n\n"
-            "*Step 4: Start Earning*\n"
-            "• Our team will handle all trading\n"
-            "• You'll receive weekly performance reports\n"
-            "• Monitor your account anytime through Puprime\n\n"
-            "Need help? Our support team is available 24/7."
-        )
-    else:
-        guide_text = (
-            "*TNETC EA Setup Guide*\n\n"
-            "*Step 1: Prepare Your Trading Account*\n"
-            "• Ensure you have MT4/MT5 installed\n"
-            "• Create/use a funded account (minimum $1000 recommended)\n"
-            "• Set account leverage (1:100 or higher recommended)\n\n"
-            "*Step 2: Install the EA*\n"
-            "• Our team will provide the EA file\n"
-            "• Follow our installation instructions\n"
-            "• Place EA on correct currency pairs\n\n"
-            "*Step 3: Configure Settings*\n"
-            "• Set risk per trade (1% recommended)\n"
-            "• Configure trading sessions\n"
-            "• Set maximum open trades\n\n"
-            "*Step 4: Monitoring & Support*\n"
-            "• Regular performance reviews\n"
-            "• 24/7 technical support\n"
-            "• Strategy updates as market conditions change\n\n"
-            "Need help? Our support team is available 24/7."
-        )
-    
-    keyboard = [
-        [InlineKeyboardButton("📱 Contact Support", url='https://t.me/trump_tnetc_admin')],
-        [InlineKeyboardButton("🏠 Main Menu", callback_data='show_all_services')]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    try:
-        if query.message:
-            await query.message.reply_text(
-                guide_text,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        else:
-            # Fallback if message is None
-            chat_id = update.effective_chat.id
-            await query.bot.send_message(
-                chat_id=chat_id,
-                text=guide_text,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-    except Exception as e:
-        logger.error(f"Error sending setup guide: {str(e)}")
+    guide_text = _COPYTRADE_SETUP_GUIDE if plan == 'copytrade' else _EA_SETUP_GUIDE
+    
+    reply_markup = _SUPPORT_KB
+    await _reply(update, guide_text, reply_markup)
+
+# Detailed statistics sent by send_ea_performance
+_EA_PERFORMANCE_TEXT = (
+    "📊 <b>TNETC EA DETAILED PERFORMANCE</b> 📊\n\n"
+    "<b>Monthly Performance (Last 6 Months):</b>\n"
+    "• January: +32.7%\n"
+    "• February: +28.4%\n"
+    "• March: +18.1%\n"
+    "• April: +25.3%\n"
+    "• May: +52.3%\n"
+    "• June: +40.36%\n\n"
+    "<b>Performance by Currency Pair:</b>\n"
+    "• EUR/USD: +29.8%\n"
+    "• GBP/USD: +31.2%\n"
+    "• USD/JPY: +26.7%\n"
+    "• XAU/USD: +19.41%\n\n"
+    "<b>Key Performance Metrics:</b>\n"
+    "• Win Rate: 80%\n"
+    "• Profit Factor: 3.2\n"
+    "• Average Win/Loss Ratio: 3.5\n"
+    "• Maximum Drawdown: 8.3%\n"
+    "• Recovery Factor: 4.8\n\n"
+    "Our EA has been consistently profitable across different market conditions. These results are verified and can be demonstrated in a live account."
+)
+
+_EA_PERFORMANCE_KB = _StaticKeyboard([
+    [InlineKeyboardButton("🤖 How Our EA Works", callback_data='ea_how_works')],
+    [InlineKeyboardButton("💰 EA Pricing Plans", callback_data='ea_pricing')],
+    [InlineKeyboardButton("🔙 Back", callback_data='back_to_ea_funnel')]
+])
 
 async def send_ea_performance(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send detailed EA performance statistics."""
@@ -1828,56 +2071,45 @@ async def send_ea_performance(update: Update, context: ContextTypes.DEFAULT_TYPE
     if update.callback_query.message is None:
         logger.warning("Message is no longer available for EA performance stats")
         return
-        
-    message = (
-        "📊 *TNETC EA DETAILED PERFORMANCE* 📊\n\n"
-        "*Monthly Performance (Last 6 Months):*\n"
-        "• January: +32.7%\n"
-        "• February: +28.4%\n"
-        "• March: +18.1%\n"
-        "• April: +25.3%\n"
-        "• May: +52.3%\n"
-        "• June: +40.36%\n\n"
-        "*Performance by Currency Pair:*\n"
-        "• EUR/USD: +29.8%\n"
-        "• GBP/USD: +31.2%\n"
-        "• USD/JPY: +26.7%\n"
-        "• XAU/USD: +19.41%\n\n"
-        "*Key Performance Metrics:*\n"
-        "• Win Rate: 80%\n"
-        "• Profit Factor: 3.2\n"
-        "• Average Win/Loss Ratio: 3.5\n"
-        "• Maximum Drawdown: 8.3%\n"
-        "• Recovery Factor: 4.8\n\n"
-        "Our EA has been consistently profitable across different market conditions. These results are verified and can be demonstrated in a live account."
-    )
-    
-    keyboard = [
-        [InlineKeyboardButton("🤖 How Our EA Works", callback_data='ea_how_works')],
-        [InlineKeyboardButton("💰 EA Pricing Plans", callback_data='ea_pricing')],
-        [InlineKeyboardButton("🔙 Back", callback_data='back_to_ea_funnel')]
-    ]
     
-    reply_markup = InlineKeyboardMarkup(keyboard)
     try:
-        await update.callback_query.message.reply_text(
-            message, 
-            reply_markup=reply_markup, 
-            parse_mode='Markdown'
-        )
+        await _send_static(update, context, 'ea_performance', _EA_PERFORMANCE_TEXT, _EA_PERFORMANCE_KB)
     except Exception as e:
         logger.error(f"Error sending EA performance stats: {str(e)}")
-        # Fallback: try to send a new message to the chat if reply_text fails
-        try:
-            chat_id = update.effective_chat.id
-            await update.callback_query.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        except Exception as inner_e:
-            logger.error(f"Fallback message also failed: {str(inner_e)}")
+
+# How the EA trades, sent by send_ea_explanation
+_EA_EXPLANATION_TEXT = (
+    "🤖 <b>HOW OUR EA TRADING BOT WORKS</b> 🤖\n\n"
+    "<b>Trading Strategy:</b>\n"
+    "Our EA uses a proprietary multi-timeframe analysis algorithm that combines:\n"
+    "• Advanced price action patterns\n"
+    "• Key support/resistance levels\n"
+    "• Market structure analysis\n"
+    "• Volatility-based entry/exit timing\n\n"
+    "<b>Risk Management:</b>\n"
+    "• Fixed 1% risk per trade\n"
+    "• Dynamic stop-loss placement\n"
+    "• Trailing take-profit mechanism\n"
+    "• Anti-drawdown protection\n\n"
+    "<b>Technical Specifications:</b>\n"
+    "• Compatible with MT4/MT5\n"
+    "• Works with any broker\n"
+    "• Trades FX majors and Gold\n"
+    "• Fully automated - set and forget\n"
+    "• 24/5 operation during market hours\n\n"
+    "<b>Setup Process:</b>\n"
+    "1. We help you set up the EA on your account\n"
+    "2. Configure risk parameters to your preference\n"
+    "3. Regular updates and optimization\n"
+    "4. Ongoing technical support\n\n"
+    "Our EA is designed to be hands-off while maintaining professional risk management standards."
+)
+
+_EA_EXPLANATION_KB = _StaticKeyboard([
+    [InlineKeyboardButton("📊 View Performance Stats", callback_data='ea_stats')],
+    [InlineKeyboardButton("💰 EA Pricing Plans", callback_data='ea_pricing')],
+    [InlineKeyboardButton("🔙 Back", callback_data='back_to_ea_funnel')]
+])
 
 async def send_ea_explanation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Explain how the EA works."""
@@ -1886,59 +2118,32 @@ async def send_ea_explanation(update: Update, context: ContextTypes.DEFAULT_TYPE
         logger.warning("Message is no longer available for EA explanation")
         return
         
-    message = (
-        "🤖 *HOW OUR EA TRADING BOT WORKS* 🤖\n\n"
-        "*Trading Strategy:*\n"
-        "Our EA uses a proprietary multi-timeframe analysis algorithm that combines:\n"
-        "• Advanced price action patterns\n"
-        "• Key support/resistance levels\n"
-        "• Market structure analysis\n"
-        "• Volatility-based entry/exit timing\n\n"
-        "*Risk Management:*\n"
-        "• Fixed 1% risk per trade\n"
-        "• Dynamic stop-loss placement\n"
-        "• Trailing take-profit mechanism\n"
-        "• Anti-drawdown protection\n\n"
-        "*Technical Specifications:*\n"
-        "• Compatible with MT4/MT5\n"
-        "• Works with any broker\n"
-        "• Trades FX majors and Gold\n"
-        "• Fully automated - set and forget\n"
-        "• 24/5 operation during market hours\n\n"
-        "*Setup Process:*\n"
-        "1. We help you set up the EA on your account\n"
-        "2. Configure risk parameters to your preference\n"
-        "3. Regular updates and optimization\n"
-        "4. Ongoing technical support\n\n"
-        "Our EA is designed to be hands-off while maintaining professional risk management standards."
-    )
-    
-    keyboard = [
-        [InlineKeyboardButton("📊 View Performance Stats", callback_data='ea_stats')],
-        [InlineKeyboardButton("💰 EA Pricing Plans", callback_data='ea_pricing')],
-        [InlineKeyboardButton("🔙 Back", callback_data='back_to_ea_funnel')]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    try:
-        await update.callback_query.message.reply_text(
-            message, 
-            reply_markup=reply_markup, 
-            parse_mode='Markdown'
-        )
-    except Exception as e:
-        logger.error(f"Error sending EA explanation: {str(e)}")
-        # Fallback: try to send a new message to the chat if reply_text fails
-        try:
-            chat_id = update.effective_chat.id
-            await update.callback_query.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        except Exception as inner_e:
-            logger.error(f"Fallback message also failed: {str(inner_e)}")
+    await _reply(update, _EA_EXPLANATION_TEXT, _EA_EXPLANATION_KB)
+
+# EA plans offered by send_ea_pricing
+_EA_PRICING_TEXT = (
+    "📈 <b>TNETC EA Pricing Plans</b>\n\n"
+    "Choose your preferred plan to start automated trading with our 80% win-rate system:"
+    "\n\nAll plans include:\n"
+    "✅ Full EA setup assistance\n"
+    "✅ 24/7 technical support\n"
+    "✅ Performance monitoring\n"
+    "✅ Regular updates\n\n"
+    "<b>Monthly Plan:</b> Perfect for trying our system\n"
+    "<b>Quarterly Plan:</b> Our most popular option\n"
+    "<b>Annual Plan:</b> Best value for serious traders\n"
+    "<b>Copytrade Option:</b> We trade for you - no technical setup needed\n\n"
+    "Select a plan below to get started:"
+)
+
+_EA_PRICING_KB = _StaticKeyboard([
+    [InlineKeyboardButton("🔄 Monthly Plan - $200", callback_data='purchase_monthly')],
+    [InlineKeyboardButton("⭐ Quarterly Plan - $500 (Save 15%)", callback_data='purchase_quarterly')],
+    [InlineKeyboardButton("🔥 Annual Plan - $1500 (Save 30%)", callback_data='purchase_annual')],
+    [InlineKeyboardButton("💰 Copytrade Option - $500 Lifetime", callback_data='purchase_copytrade')],
+    [InlineKeyboardButton("❓ Questions? Chat with Support", url='https://t.me/trump_tnetc_admin')],
+    [InlineKeyboardButton("🔙 Back to EA Info", callback_data='back_to_ea_funnel')]
+])
 
 async def send_ea_pricing(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show EA pricing options with clear next steps."""
@@ -1947,498 +2152,317 @@ async def send_ea_pricing(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         logger.warning("Message is no longer available for EA pricing")
         return
         
-    keyboard = [
-        [InlineKeyboardButton("🔄 Monthly Plan - $200", callback_data='purchase_monthly')],
-        [InlineKeyboardButton("⭐ Quarterly Plan - $500 (Save 15%)", callback_data='purchase_quarterly')],
-        [InlineKeyboardButton("🔥 Annual Plan - $1500 (Save 30%)", callback_data='purchase_annual')],
-        [InlineKeyboardButton("💰 Copytrade Option - $500 Lifetime", callback_data='purchase_copytrade')],
-        [InlineKeyboardButton("❓ Questions? Chat with Support", url='https://t.me/trump_tnetc_admin')],
-        [InlineKeyboardButton("🔙 Back to EA Info", callback_data='back_to_ea_funnel')],
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    try:
-        await update.callback_query.message.reply_text(
-            "📈 *TNETC EA Pricing Plans*\n\n"
-            "Choose your preferred plan to start automated trading with our 80% win-rate system:"
-            "\n\nAll plans include:\n"
-            "✅ Full EA setup assistance\n"
-            "✅ 24/7 technical support\n"
-            "✅ Performance monitoring\n"
-            "✅ Regular updates\n\n"
-            "*Monthly Plan:* Perfect for trying our system\n"
-            "*Quarterly Plan:* Our most popular option\n"
-            "*Annual Plan:* Best value for serious traders\n"
-            "*Copytrade Option:* We trade for you - no technical setup needed\n\n"
-            "Select a plan below to get started:",
-            reply_markup=reply_markup,
-            parse_mode='Markdown'
-        )
-    except Exception as e:
-        logger.error(f"Error sending EA pricing: {str(e)}")
-        # Fallback: try to send a new message to the chat if reply_text fails
-        try:
-            chat_id = update.effective_chat.id
-            await update.callback_query.bot.send_message(
-                chat_id=chat_id,
-                text="📈 *TNETC EA Pricing Plans*\n\n"
-                "Choose your preferred plan to start automated trading with our 80% win-rate system:"
-                "\n\nAll plans include:\n"
-                "✅ Full EA setup assistance\n"
-                "✅ 24/7 technical support\n"
-                "✅ Performance monitoring\n"
-                "✅ Regular updates\n\n"
-                "*Monthly Plan:* Perfect for trying our system\n"
-                "*Quarterly Plan:* Our most popular option\n"
-                "*Annual Plan:* Best value for serious traders\n"
-                "*Copytrade Option:* We trade for you - no technical setup needed\n\n"
-                "Select a plan below to get started:",
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        except Exception as inner_e:
-            logger.error(f"Fallback message also failed: {str(inner_e)}")
+    await _reply(update, _EA_PRICING_TEXT, _EA_PRICING_KB)
+
+# Signal performance sent by send_signal_results
+_SIGNAL_RESULTS_TEXT = (
+    "📊 <b>TNETC SIGNAL PERFORMANCE RESULTS</b> 📊\n\n"
+    "<b>Last Month Performance:</b>\n"
+    "• Forex: +40.36% ✅\n"
+    "• Gold: +19.41% ✅\n"
+    "• Combined Win Rate: 94% 🚀\n\n"
+    "<b>Signal Frequency:</b>\n"
+    "• 1-3 signals per day\n"
+    "• Each with detailed entry, TP, and SL levels\n"
+    "• Multi-timeframe analysis included\n\n"
+    "<b>Risk Management:</b>\n"
+    "• Recommended 1-2% risk per trade\n"
+    "• Average risk-reward ratio: 1:3\n"
+    "• Detailed trade management instructions\n\n"
+    "Get our premium signals combined with EA trading in our Premium VIP Signal + EA Trading Bot package!"
+)
+
+_SIGNAL_RESULTS_KB = _StaticKeyboard([
+    [InlineKeyboardButton("💎 Premium VIP Signal + EA Bundle", callback_data='premium_vip_ea')],
+    [InlineKeyboardButton("🔙 Back", callback_data='back_to_signal_welcome')]
+])
 
 async def send_signal_results(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send Signal performance results with proof images."""
     # Check if message is available
     if update.callback_query.message is None:
         logger.warning("Message is no longer available for Signal results")
-        chat_id = update.effective_chat.id
-        if not chat_id:
+        if update.effective_chat is None:
             logger.error("Could not determine chat ID for Signal results")
             return
         
-    message = (
-        "📊 *TNETC SIGNAL PERFORMANCE RESULTS* 📊\n\n"
-        "*Last Month Performance:*\n"
-        "• Forex: +40.36% ✅\n"
-        "• Gold: +19.41% ✅\n"
-        "• Combined Win Rate: 94% 🚀\n\n"
-        "*Signal Frequency:*\n"
-        "• 1-3 signals per day\n"
-        "• Each with detailed entry, TP, and SL levels\n"
-        "• Multi-timeframe analysis included\n\n"
-        "*Risk Management:*\n"
-        "• Recommended 1-2% risk per trade\n"
-        "• Average risk-reward ratio: 1:3\n"
-        "• Detailed trade management instructions\n\n"
-        "Get our premium signals combined with EA trading in our Premium VIP Signal + EA Trading Bot package!"
-    )
-    
-    keyboard = [
-        [InlineKeyboardButton("💎 Premium VIP Signal + EA Bundle", callback_data='premium_vip_ea')],
-        [InlineKeyboardButton("🔙 Back", callback_data='back_to_signal_welcome')]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    msg = await _reply(update, _SIGNAL_RESULTS_TEXT, _SIGNAL_RESULTS_KB)
+    if msg is None:
+        return
+
+    # Send 3 random proof images
     try:
-        if update.callback_query.message:
-            msg = await update.callback_query.message.reply_text(
-                message, 
-                reply_markup=reply_markup, 
-                parse_mode='Markdown'
-            )
-        else:
-            msg = await context.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
+        proof_images = await asyncio.to_thread(list_images, PROOF_IMAGES_DIR, ('.jpg',))
+        selected_images = random.sample(proof_images, min(3, len(proof_images)))
+        
+        for img_file in selected_images:
+            photo = await asyncio.to_thread(read_image, os.path.join(PROOF_IMAGES_DIR, img_file))
+            if photo is not None:
+                await context.bot.send_photo(
+                    chat_id=msg.chat_id,
+                    photo=photo,
+                    caption="📈 Real Member Profit Proof",
+                    parse_mode=None
+                )
+    except Exception as img_error:
+        logger.error(f"Error sending proof images: {str(img_error)}")
+
+# Premium bundle price list shared by the VIP benefits and bundle screens
+_PREMIUM_PRICING_BLOCK = (
+    "<b>Premium Package Pricing:</b>\n"
+    "• Monthly: $400/month\n"
+    "• Quarterly: $1000 (Save 16%)\n"
+    "• Annual: $3000 (Save 37%)\n\n"
+)
 
-        # Send 3 random proof images
-        try:
-            proof_images = [f for f in os.listdir(PROOF_IMAGES_DIR) if f.lower().endswith('.jpg')]
-            selected_images = random.sample(proof_images, min(3, len(proof_images)))
-            
-            for img_file in selected_images:
-                img_path = os.path.join(PROOF_IMAGES_DIR, img_file)
-                with open(img_path, 'rb') as photo:
-                    await context.bot.send_photo(
-                        chat_id=msg.chat_id,
-                        photo=photo,
-                        caption="📈 Real Member Profit Proof",
-                        parse_mode='Markdown'
-                    )
-        except Exception as img_error:
-            logger.error(f"Error sending proof images: {str(img_error)}")
+# VIP membership benefits sent by send_vip_benefits
+_VIP_BENEFITS_TEXT = (
+    "💎 <b>PREMIUM VIP SIGNAL + EA TRADING BOT BENEFITS</b> 💎\n\n"
+    "<b>Exclusive Access:</b>\n"
+    "• Private VIP-only Telegram group\n"
+    "• Direct access to professional traders\n"
+    "• Priority support 24/7\n\n"
+    "<b>Enhanced Trading:</b>\n"
+    "• Expert 1-on-1 signal guidance\n"
+    "• High-performance EA trading bot (80% win rate)\n"
+    "• VIP-only signals with higher win rates\n"
+    "• Advanced entry/exit strategies\n"
+    "• Priority notification for market-moving events\n\n"
+    "<b>Education &amp; Growth:</b>\n"
+    "• Advanced trading documentation\n"
+    "• Monthly strategy sessions\n"
+    "• Performance reviews and optimization\n\n"
+    + _PREMIUM_PRICING_BLOCK +
+    "Join our Premium VIP + EA package and elevate your trading to the next level!"
+)
 
-    except Exception as e:
-        logger.error(f"Error sending Signal results: {str(e)}")
-        # Fallback: try to send a new message to the chat if reply_text fails
-        try:
-            chat_id = update.effective_chat.id
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        except Exception as inner_e:
-            logger.error(f"Fallback message also failed: {str(inner_e)}")
+_VIP_BENEFITS_KB = _StaticKeyboard([
+    [InlineKeyboardButton("💎 Get Premium VIP + EA Bundle", callback_data='premium_vip_ea')],
+    [InlineKeyboardButton("🔙 Back", callback_data='back_to_vip_welcome')]
+])
 
 async def send_vip_benefits(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send VIP benefits details."""
     # Check if message is available
     if update.callback_query.message is None:
         logger.warning("Message is no longer available for VIP benefits")
-        chat_id = update.effective_chat.id
-        if not chat_id:
+        if update.effective_chat is None:
             logger.error("Could not determine chat ID for VIP benefits")
             return
     
-    message = (
-        "💎 *PREMIUM VIP SIGNAL + EA TRADING BOT BENEFITS* 💎\n\n"
-        "*Exclusive Access:*\n"
-        "• Private VIP-only Telegram group\n"
-        "• Direct access to professional traders\n"
-        "• Priority support 24/7\n\n"
-        "*Enhanced Trading:*\n"
-        "• Expert 1-on-1 signal guidance\n"
-        "• High-performance EA trading bot (80% win rate)\n"
-        "• VIP-only signals with higher win rates\n"
-        "• Advanced entry/exit strategies\n"
-        "• Priority notification for market-moving events\n\n"
-        "*Education & Growth:*\n"
-        "• Advanced trading documentation\n"
-        "• Monthly strategy sessions\n"
-        "• Performance reviews and optimization\n\n"
-        "*Premium Package Pricing:*\n"
-        "• Monthly: $400/month\n"
-        "• Quarterly: $1000 (Save 16%)\n"
-        "• Annual: $3000 (Save 37%)\n\n"
-        "Join our Premium VIP + EA package and elevate your trading to the next level!"
-    )
-    
-    keyboard = [
-        [InlineKeyboardButton("💎 Get Premium VIP + EA Bundle", callback_data='premium_vip_ea')],
-        [InlineKeyboardButton("🔙 Back", callback_data='back_to_vip_welcome')]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    try:
-        if update.callback_query.message:
-            await update.callback_query.message.reply_text(
-                message, 
-                reply_markup=reply_markup, 
-                parse_mode='Markdown'
-            )
-        else:
-            # Fallback if message is None
-            chat_id = update.effective_chat.id
-            await update.callback_query.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-    except Exception as e:
-        logger.error(f"Error sending VIP benefits: {str(e)}")
-        # Fallback: try to send a new message to the chat if reply_text fails
-        try:
-            chat_id = update.effective_chat.id
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        except Exception as inner_e:
-            logger.error(f"Fallback message also failed: {str(inner_e)}")
+    await _reply(update, _VIP_BENEFITS_TEXT, _VIP_BENEFITS_KB)
+
+# chat_id -> (monotonic time before which no error reply is sent, current back-off in seconds),
+# forgotten once a chat has been quiet for a while
+_error_reply_backoff = TTLCache(maxsize=10000, ttl=2 * ERROR_REPLY_MAX_BACKOFF)
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle errors."""
     error_details = {
         "error_type": type(context.error).__name__,
         "error_message": str(context.error),
-        "timestamp": datetime.now().isoformat()
+        "timestamp": int(time.time())
     }
     
     if update:
-        log_user_interaction(update, "error", error_details)
+        _in_background(log_user_interaction(update, "error", error_details))
     else:
-        logger.error(f"Update caused error: {json.dumps(error_details, indent=2)}")
+        logger.error(f"Update caused error: {_json_encode(error_details)}")
+    
+    message = update.effective_message if isinstance(update, Update) else None
+    if message is None:
+        return
+    
+    # Back off exponentially per chat so a failing chat can't turn errors into a reply flood
+    now = time.monotonic()
+    next_reply, backoff = _error_reply_backoff.get(message.chat_id, (0.0, 0.0))
+    if now < next_reply:
+        return
+    backoff = min(backoff * 2, ERROR_REPLY_MAX_BACKOFF) if backoff else 1.0
+    _error_reply_backoff[message.chat_id] = (now + backoff, backoff)
     
     try:
-        if update and update.effective_message:
-            await update.effective_message.reply_text(
-                "Sorry, something went wrong. Please try again later."
-            )
+        await message.reply_text(
+            "Sorry, something went wrong. Please try again later.",
+            parse_mode=None
+        )
     except Exception as e:
         logger.error(f"Error in error handler: {str(e)}")
 
 async def get_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Admin command to get database statistics."""
     # Check if user is admin
-    admin_ids = [123456789]  # Replace with actual admin IDs
-    if update.effective_user.id not in admin_ids:
-        await update.message.reply_text("You don't have permission to use this command.")
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("You don't have permission to use this command.", parse_mode=None)
         return
     
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            
-            # Get user count
-            cursor.execute("SELECT COUNT(*) FROM users")
-            user_count = cursor.fetchone()[0]
-            
-            # Get interaction count
-            cursor.execute("SELECT COUNT(*) FROM interactions")
-            interaction_count = cursor.fetchone()[0]
-            
-            # Get purchase count
-            cursor.execute("SELECT COUNT(*) FROM purchases")
-            purchase_count = cursor.fetchone()[0]
-            
-            # Get follow-up stats
-            cursor.execute("SELECT status, COUNT(*) FROM followups GROUP BY status")
-            followup_stats = cursor.fetchall()
-            
-            # Get campaign stats
-            cursor.execute("SELECT campaign, COUNT(*) FROM users WHERE campaign IS NOT NULL GROUP BY campaign")
-            campaign_stats = cursor.fetchall()
-            
-            # Format stats message
-            stats_message = (
-                "*TNETC Bot Statistics*\n\n"
-                f"Total Users: {user_count}\n"
-                f"Total Interactions: {interaction_count}\n"
-                f"Total Purchases: {purchase_count}\n\n"
-                "*Follow-up Statistics:*\n"
-            )
-            
-            for status, count in followup_stats:
-                stats_message += f"• {status.capitalize()}: {count}\n"
-            
-            stats_message += "\n*Campaign Statistics:*\n"
-            
-            for campaign, count in campaign_stats:
-                stats_message += f"• {campaign}: {count}\n"
-            
-            await update.message.reply_text(stats_message, parse_mode='Markdown')
-        except Error as e:
-            logger.error(f"Database query error: {e}")
-            await update.message.reply_text(f"Error retrieving statistics: {str(e)}")
-        finally:
-            conn.close()
-    else:
-        await update.message.reply_text("Error connecting to database.")
+    try:
+        counts, followup_stats, campaign_stats = await asyncio.to_thread(
+            run_read_queries,
+            (
+                "SELECT (SELECT COUNT(*) FROM users), (SELECT COUNT(*) FROM interactions), "
+                "(SELECT COUNT(*) FROM purchases)",
+                ()
+            ),
+            ("SELECT status, COUNT(*) FROM followups GROUP BY status", ()),
+            ("SELECT campaign, COUNT(*) FROM users WHERE campaign IS NOT NULL GROUP BY campaign", ())
+        )
+    except Error as e:
+        logger.error(f"Database query error: {e}")
+        await update.message.reply_text(f"Error retrieving statistics: {str(e)}", parse_mode=None)
+        return
+    
+    user_count, interaction_count, purchase_count = counts[0]
+    
+    # Format stats message
+    parts = [
+        "<b>TNETC Bot Statistics</b>\n\n"
+        f"Total Users: {user_count}\n"
+        f"Total Interactions: {interaction_count}\n"
+        f"Total Purchases: {purchase_count}\n\n"
+        "<b>Follow-up Statistics:</b>\n"
+    ]
+    parts.extend(f"• {html.escape(status.capitalize())}: {count}\n" for status, count in followup_stats)
+    
+    parts.append("\n<b>Campaign Statistics:</b>\n")
+    parts.extend(f"• {html.escape(campaign)}: {count}\n" for campaign, count in campaign_stats)
+    
+    await _reply_long(update.message, ''.join(parts))
 
 async def get_user_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Admin command to get information about a specific user."""
     # Check if user is admin
-    admin_ids = [123456789]  # Replace with actual admin IDs
-    if update.effective_user.id not in admin_ids:
-        await update.message.reply_text("You don't have permission to use this command.")
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("You don't have permission to use this command.", parse_mode=None)
         return
     
     # Check if user ID is provided
     if not context.args or len(context.args) < 1:
-        await update.message.reply_text("Please provide a user ID. Usage: /user_info [user_id]")
+        await update.message.reply_text("Please provide a user ID. Usage: /user_info [user_id]", parse_mode=None)
         return
     
     try:
         user_id = int(context.args[0])
     except ValueError:
-        await update.message.reply_text("Invalid user ID. Please provide a numeric ID.")
+        await update.message.reply_text("Invalid user ID. Please provide a numeric ID.", parse_mode=None)
         return
     
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            
-            # Get user info
-            cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-            user = cursor.fetchone()
-            
-            if not user:
-                await update.message.reply_text(f"User with ID {user_id} not found.")
-                return
-            
-            # Get user's services viewed
-            cursor.execute("SELECT service, view_count, last_viewed FROM services_viewed WHERE user_id = ?", (user_id,))
-            services = cursor.fetchall()
-            
-            # Get user's purchases
-            cursor.execute("SELECT plan_code, purchase_date, price FROM purchases WHERE user_id = ?", (user_id,))
-            purchases = cursor.fetchall()
-            
-            # Get user's follow-ups
-            cursor.execute("SELECT service, scheduled_date, status, response FROM followups WHERE user_id = ?", (user_id,))
-            followups = cursor.fetchall()
-            
-            # Format user info message
-            user_info = (
-                f"*User Information for ID {user_id}*\n\n"
-                f"Username: @{user[1] or 'None'}\n"
-                f"Name: {user[2] or ''} {user[3] or ''}\n"
-                f"Join Date: {user[4]}\n"
-                f"Last Interaction: {user[5]}\n"
-                f"Purchased: {'Yes' if user[6] == 1 else 'No'}\n"
-                f"Campaign: {user[7] or 'None'}\n\n"
-            )
-            
-            if services:
-                user_info += "*Services Viewed:*\n"
-                for service, view_count, last_viewed in services:
-                    user_info += f"• {service.capitalize()}: {view_count} views (last: {last_viewed})\n"
-                user_info += "\n"
-            
-            if purchases:
-                user_info += "*Purchases:*\n"
-                for plan, date, price in purchases:
-                    user_info += f"• {plan} ({price}) on {date}\n"
-                user_info += "\n"
-            
-            if followups:
-                user_info += "*Follow-ups:*\n"
-                for service, date, status, response in followups:
-                    user_info += f"• {service.capitalize()}: {status} on {date}"
-                    if response:
-                        user_info += f" (Response: {response})"
-                    user_info += "\n"
-            
-            await update.message.reply_text(user_info, parse_mode='Markdown')
-        except Error as e:
-            logger.error(f"Database query error: {e}")
-            await update.message.reply_text(f"Error retrieving user information: {str(e)}")
-        finally:
-            conn.close()
-    else:
-        await update.message.reply_text("Error connecting to database.")
+    try:
+        users, services, purchases, followups = await asyncio.to_thread(fetch_user_info, user_id)
+    except Error as e:
+        logger.error(f"Database query error: {e}")
+        await update.message.reply_text(f"Error retrieving user information: {str(e)}", parse_mode=None)
+        return
+    
+    if not users:
+        await update.message.reply_text(f"User with ID {user_id} not found.", parse_mode=None)
+        return
+    user = users[0]
+    
+    # Usernames, names and campaigns are user-controlled, escape them for HTML
+    username, first_name, last_name, campaign = (
+        html.escape(value or '') for value in user[0:3] + user[6:7]
+    )
+    
+    # Format user info message
+    parts = [
+        f"<b>User Information for ID {user_id}</b>\n\n"
+        f"Username: @{username or 'None'}\n"
+        f"Name: {first_name} {last_name}\n"
+        f"Join Date: {format_timestamp(user[3])}\n"
+        f"Last Interaction: {format_timestamp(user[4])}\n"
+        f"Purchased: {'Yes' if user[5] == 1 else 'No'}\n"
+        f"Campaign: {campaign or 'None'}\n\n"
+    ]
+    
+    if services:
+        parts.append("<b>Services Viewed:</b>\n")
+        for service, view_count, last_viewed in services:
+            parts.append(f"• {html.escape(service.capitalize())}: {view_count} views (last: {format_timestamp(last_viewed)})\n")
+        parts.append("\n")
+    
+    if purchases:
+        parts.append("<b>Purchases:</b>\n")
+        for plan, date, price in purchases:
+            parts.append(f"• {html.escape(plan)} ({price}) on {format_timestamp(date)}\n")
+        parts.append("\n")
+    
+    if followups:
+        parts.append("<b>Follow-ups:</b>\n")
+        for service, date, status, response in followups:
+            parts.append(f"• {html.escape(service.capitalize())}: {status} on {format_timestamp(date)}")
+            if response:
+                parts.append(f" (Response: {html.escape(response)})")
+            parts.append("\n")
+    
+    await _reply_long(update.message, ''.join(parts))
 
 async def export_users(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Admin command to export user data to a CSV file."""
     # Check if user is admin
-    admin_ids = [123456789]  # Replace with actual admin IDs
-    if update.effective_user.id not in admin_ids:
-        await update.message.reply_text("You don't have permission to use this command.")
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("You don't have permission to use this command.", parse_mode=None)
         return
     
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            
-            # Get all users
-            cursor.execute("""
-                SELECT u.user_id, u.username, u.first_name, u.last_name, u.join_date, u.last_interaction, 
-                       u.purchased, u.campaign, COUNT(DISTINCT p.id) as purchase_count
-                FROM users u
-                LEFT JOIN purchases p ON u.user_id = p.user_id
-                GROUP BY u.user_id
-            """)
-            users = cursor.fetchall()
-            
-            if not users:
-                await update.message.reply_text("No users found in the database.")
-                return
-            
-            # Create CSV file
-            import csv
-            from io import StringIO
-            
-            csv_file = StringIO()
-            csv_writer = csv.writer(csv_file)
-            
-            # Write header
-            csv_writer.writerow([
-                'User ID', 'Username', 'First Name', 'Last Name', 'Join Date', 
-                'Last Interaction', 'Purchased', 'Campaign', 'Purchase Count'
-            ])
-            
-            # Write user data
-            for user in users:
-                csv_writer.writerow(user)
-            
-            # Send CSV file
-            csv_file.seek(0)
-            await update.message.reply_document(
-                document=csv_file.getvalue().encode(),
-                filename='tnetc_users.csv',
-                caption=f"Exported {len(users)} users."
-            )
-        except Error as e:
-            logger.error(f"Database query error: {e}")
-            await update.message.reply_text(f"Error exporting users: {str(e)}")
-        finally:
-            conn.close()
-    else:
-        await update.message.reply_text("Error connecting to database.")
+    try:
+        csv_file, count = await asyncio.to_thread(export_users_csv)
+    except Error as e:
+        logger.error(f"Database query error: {e}")
+        await update.message.reply_text(f"Error exporting users: {str(e)}", parse_mode=None)
+        return
+    
+    if not count:
+        await update.message.reply_text("No users found in the database.", parse_mode=None)
+        return
+    
+    # Send CSV file
+    await update.message.reply_document(
+        document=csv_file,
+        filename='tnetc_users.csv',
+        caption=f"Exported {count} users.",
+        parse_mode=None
+    )
+
+# Premium VIP Signal + EA bundle sent by send_premium_vip_ea_details
+_PREMIUM_VIP_EA_TEXT = (
+    "<b>💎 Premium VIP Signal + EA Trading Bot 💎</b>\n\n"
+    "Our most comprehensive package combining premium VIP signals and our high-performance EA trading bot.\n\n"
+    "<b>What's Included:</b>\n"
+    "✅ Expert 1-on-1 signal guidance\n"
+    "✅ High-performance EA trading bot (80% win rate)\n"
+    "✅ VIP copy trading with higher returns\n"
+    "✅ 24/7 VIP support\n"
+    "✅ Private VIP-only Telegram group\n"
+    "✅ Advanced entry/exit strategies\n"
+    "✅ Priority notification for market-moving events\n"
+    "✅ Monthly strategy sessions\n"
+    "✅ Regular EA updates and optimization\n\n"
+    + _PREMIUM_PRICING_BLOCK +
+    "To get started with this premium package, contact our support team."
+)
+
+_PREMIUM_VIP_EA_KB = _StaticKeyboard([
+    [InlineKeyboardButton("📱 Contact Support", url='https://t.me/trump_tnetc_admin')],
+    [InlineKeyboardButton("✅ I've Made Payment", callback_data='payment_made_premium_vip_ea')],
+    [InlineKeyboardButton("🔙 Back to Plans", callback_data='show_all_services')]
+])
 
 async def send_premium_vip_ea_details(update, context):
     """Send details about the Premium VIP with EA Trading Bot bundle."""
-    query = update.callback_query
-    
-    message = (
-        "*💎 Premium VIP Signal + EA Trading Bot 💎*\n\n"
-        "Our most comprehensive package combining premium VIP signals and our high-performance EA trading bot.\n\n"
-        "*What's Included:*\n"
-        "✅ Expert 1-on-1 signal guidance\n"
-        "✅ High-performance EA trading bot (80% win rate)\n"
-        "✅ VIP copy trading with higher returns\n"
-        "✅ 24/7 VIP support\n"
-        "✅ Private VIP-only Telegram group\n"
-        "✅ Advanced entry/exit strategies\n"
-        "✅ Priority notification for market-moving events\n"
-        "✅ Monthly strategy sessions\n"
-        "✅ Regular EA updates and optimization\n\n"
-        "*Premium Package Pricing:*\n"
-        "• Monthly: $400/month\n"
-        "• Quarterly: $1000 (Save 16%)\n"
-        "• Annual: $3000 (Save 37%)\n\n"
-        "To get started with this premium package, contact our support team."
-    )
-    
-    keyboard = [
-        [InlineKeyboardButton("📱 Contact Support", url='https://t.me/trump_tnetc_admin')],
-        [InlineKeyboardButton("✅ I've Made Payment", callback_data='payment_made_premium_vip_ea')],
-        [InlineKeyboardButton("🔙 Back to Plans", callback_data='show_all_services')]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    try:
-        if query.message:
-            await query.message.reply_text(
-                message, 
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        else:
-            # Fallback if message is None
-            chat_id = update.effective_chat.id
-            await query.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-    except Exception as e:
-        logger.error(f"Error sending premium VIP+EA details: {str(e)}")
-        # Fallback: try to send a new message to the chat if reply_text fails
-        try:
-            chat_id = update.effective_chat.id
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-        except Exception as inner_e:
-            logger.error(f"Fallback message also failed: {str(inner_e)}")
+    await _reply(update, _PREMIUM_VIP_EA_TEXT, _PREMIUM_VIP_EA_KB)
+
+# Call to action sent after the testimonial images
+_TESTIMONIAL_CTA_KB = _StaticKeyboard([
+    [InlineKeyboardButton("🔥 Join VIP Now (Limited Spots)", callback_data="premium_vip_ea")]
+])
 
 async def send_testimonial_to_user(context, chat_id, service):
     """Send testimonial images to a user from the testimonial_images directory."""
-    logger.info(f"Sending testimonial to user {chat_id} for service {service}")
+    logger.debug(f"Sending testimonial to user {chat_id} for service {service}")
     
     try:
         # Get all testimonial images
-        image_files = [f for f in os.listdir(TESTIMONIAL_IMAGES_DIR) 
-                      if f.lower().endswith(('.png', '.jpg', '.jpeg')) and not f.startswith('.')]
+        image_files = await asyncio.to_thread(list_images, TESTIMONIAL_IMAGES_DIR)
         
         if not image_files:
             logger.warning("No testimonial images found in directory")
@@ -2450,64 +2474,207 @@ async def send_testimonial_to_user(context, chat_id, service):
         
         # Create engaging captions
         testimonial_captions = [
-            "🔥 *Another member just posted:* \"I'm up $7,890 this week using the signals!\"",
-            "💰 *VIP Member results:* \"Just hit my first $10K profit day thanks to this group!\"",
-            "📈 *Verified member:* \"I've already made back 5x what I paid for this service!\"",
-            "🚀 *Member testimonial:* \"These signals are insanely accurate - 8/10 winners today!\"",
-            "💯 *Just in:* \"Been using the EA for 2 weeks and already up 37% - incredible!\"",
-            "⚡️ *Member feedback:* \"This is the only trading group that consistently delivers!\"",
-            "🏆 *Top performer:* \"Turned $5K into $22K in just one month following these signals\"",
-            "🔐 *VIP member:* \"Finally found a service that actually delivers as promised!\""
+            "🔥 <b>Another member just posted:</b> \"I'm up $7,890 this week using the signals!\"",
+            "💰 <b>VIP Member results:</b> \"Just hit my first $10K profit day thanks to this group!\"",
+            "📈 <b>Verified member:</b> \"I've already made back 5x what I paid for this service!\"",
+            "🚀 <b>Member testimonial:</b> \"These signals are insanely accurate - 8/10 winners today!\"",
+            "💯 <b>Just in:</b> \"Been using the EA for 2 weeks and already up 37% - incredible!\"",
+            "⚡️ <b>Member feedback:</b> \"This is the only trading group that consistently delivers!\"",
+            "🏆 <b>Top performer:</b> \"Turned $5K into $22K in just one month following these signals\"",
+            "🔐 <b>VIP member:</b> \"Finally found a service that actually delivers as promised!\""
         ]
         
         # Prepare the message text
-        intro_message = "*🔥 Latest Results from Our Community 🔥*\n\nMembers are crushing it with our exclusive signals & EA bot...\n\n"
+        intro_message = "<b>🔥 Latest Results from Our Community 🔥</b>\n\nMembers are crushing it with our exclusive signals &amp; EA bot...\n\n"
         
         # Send intro message
         await context.bot.send_message(
             chat_id=chat_id,
-            text=intro_message,
-            parse_mode='Markdown'
+            text=intro_message
         )
         
         # Send images individually instead of as a group
         for img_file in selected_images:
-            img_path = os.path.join(TESTIMONIAL_IMAGES_DIR, img_file)
             caption = random.choice(testimonial_captions)
             
-            # Open the file in binary mode
-            with open(img_path, 'rb') as photo:
+            # Read on a worker thread, skipping an image deleted since it was listed
+            photo = await asyncio.to_thread(read_image, os.path.join(TESTIMONIAL_IMAGES_DIR, img_file))
+            if photo is not None:
                 await context.bot.send_photo(
                     chat_id=chat_id,
                     photo=photo,
-                    caption=caption,
-                    parse_mode='Markdown'
+                    caption=caption
                 )
         
         # Send call to action
-        keyboard = [
-            [InlineKeyboardButton("🔥 Join VIP Now (Limited Spots)", callback_data="premium_vip_ea")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
         await context.bot.send_message(
             chat_id=chat_id,
-            text="*⏰ Don't Miss Out! Our special promotion ends soon!*\n\nSecure your spot now before prices increase!",
-            reply_markup=reply_markup,
-            parse_mode='Markdown'
+            text="<b>⏰ Don't Miss Out! Our special promotion ends soon!</b>\n\nSecure your spot now before prices increase!",
+            reply_markup=_TESTIMONIAL_CTA_KB
         )
         
     except Exception as e:
         logger.error(f"Error sending testimonial: {str(e)}")
 
+# Names of testimonial jobs that are scheduled but haven't run yet, forgotten after
+# PENDING_TESTIMONIAL_TTL in case the job queue skipped the job as a misfire
+_pending_testimonials = TTLCache(maxsize=50000, ttl=PENDING_TESTIMONIAL_TTL)
+
+def _want_testimonial(chance):
+    """Decide whether a screen is followed by a testimonial, skipping them while too many are pending."""
+    return len(_pending_testimonials) < MAX_PENDING_TESTIMONIALS and random.random() < chance
+
+async def _testimonial_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Job callback sending the testimonial described by the job's data."""
+    job = context.job
+    _pending_testimonials.pop(job.name, None)
+    await send_testimonial_to_user(context, job.data['chat_id'], job.data['service'])
+
+def schedule_testimonial(job_queue, chat_id, service, delay, name):
+    """Schedule a testimonial for a chat unless one of the same name is still pending."""
+    if job_queue is None or name in _pending_testimonials:
+        return False
+    
+    # Only marked pending once the job exists, _testimonial_job clears the mark or it expires
+    job_queue.run_once(_testimonial_job, delay, data={'chat_id': chat_id, 'service': service}, name=name)
+    _pending_testimonials[name] = True
+    return True
+
+# Callback data -> handler, used by button_click
+_BUTTON_HANDLERS = {
+    'premium_vip_ea': send_premium_vip_ea_details,
+    'special_challenge': send_challenge_details,
+    'copytrade_lifetime': send_copytrade_details,
+    'standard_trial': send_plan_card,
+    'standard_monthly': send_plan_card,
+    'standard_lifetime': send_plan_card,
+    'vip_monthly': send_plan_card,
+    'vip_lifetime': send_plan_card,
+    
+    # EA-specific handlers
+    'ea_results': send_ea_results,
+    'ea_stats': send_ea_performance,
+    'ea_how_works': send_ea_explanation,
+    'ea_pricing': send_ea_pricing,
+    
+    # Signal and VIP specific handlers
+    'signal_results': send_signal_results,
+    'vip_benefits': send_vip_benefits,
+    
+    # Navigation handlers
+    'show_all_services': _navigation(regular_welcome),
+    'back_to_ea_welcome': _navigation(ea_focused_welcome),
+    'back_to_signal_welcome': _navigation(signal_focused_welcome),
+    'back_to_vip_welcome': _navigation(vip_focused_welcome),
+    'back_to_ea_funnel': _navigation(ea_focused_welcome),
+}
+
+# Screens whose content never changes, repeat taps on them are debounced in button_click
+_STATIC_SCREENS = frozenset({'ea_results', 'ea_stats', 'ea_how_works', 'signal_results', 'vip_benefits'})
+
+# Handlers for callback data carrying a plan or response after a fixed prefix
+_BUTTON_PREFIX_HANDLERS = (
+    (_PURCHASE_PREFIX, handle_purchase_selection),
+    (_PAYMENT_MADE_PREFIX, handle_payment_confirmation),
+    (_SETUP_GUIDE_PREFIX, send_setup_guide),
+    (_RESUME_PREFIX, handle_followup_response),
+    ('followup_', handle_followup_response),
+)
+
+# Keyword in callback data or a plan code -> service of the testimonial sent after it, longest
+# keywords first so the premium bundle isn't taken for the plain EA
+_SERVICE_KEYWORDS = (
+    ('premium_vip_ea', 'vip_ea'),
+    ('challenge', 'challenge'),
+    ('copytrade', 'copytrade'),
+    ('signal', 'signal'),
+    ('vip', 'vip'),
+    ('ea', 'ea'),
+)
+
+@lru_cache(maxsize=256)
+def _service_from_data(data):
+    """Return the service named in callback data or a plan code, None if there is none."""
+    return next((service for keyword, service in _SERVICE_KEYWORDS if keyword in data), None)
+
+# Callback data -> service to follow up on after the handler ran
+_BUTTON_FOLLOWUPS = {
+    'premium_vip_ea': 'vip_ea',
+    'standard_trial': 'standard',
+    'standard_monthly': 'standard',
+    'standard_lifetime': 'standard',
+    'vip_monthly': 'vip',
+    'vip_lifetime': 'vip',
+}
+
+@lru_cache(maxsize=256)
+def _button_route(data):
+    """Return everything button_click needs to know about a button's callback data."""
+    handler = _BUTTON_HANDLERS.get(data)
+    if handler is None:
+        handler = next((h for prefix, h in _BUTTON_PREFIX_HANDLERS if data.startswith(prefix)), None)
+    testimonial_service = _service_from_data(data)
+    followup_service = _BUTTON_FOLLOWUPS.get(data)
+    debounced = data in _STATIC_SCREENS or data.startswith(_SETUP_GUIDE_PREFIX)
+    return handler, testimonial_service, followup_service, debounced
+
+# AIORateLimiter only limits groups and the bot as a whole, so a burst to one user
+# (a reply followed by testimonial photos) could draw a 429 whose retry_after
+# pauses the requests of every chat until it expires
+class _ChatRateLimiter(AIORateLimiter):
+    """AIORateLimiter that also paces requests to each private chat."""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # chat_id -> limiter of a private chat, dropped once the chat is quiet
+        self._chat_limiters = TTLCache(maxsize=50000, ttl=10 * PRIVATE_CHAT_TIME_PERIOD)
+    
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+        if not isinstance(chat_id, int) or chat_id < 0:
+            return await super().process_request(callback, args, kwargs, endpoint, data, rate_limit_args)
+        
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            limiter = self._chat_limiters[chat_id] = AsyncLimiter(PRIVATE_CHAT_MAX_RATE, PRIVATE_CHAT_TIME_PERIOD)
+        async with limiter:
+            return await super().process_request(callback, args, kwargs, endpoint, data, rate_limit_args)
+
+async def post_init(application: Application) -> None:
+    """Prepare the database once the application is starting."""
+    init_db()
+
 def main() -> None:
     """Start the bot."""
     try:
         # Validate token before starting the bot
         token = validate_token()
         
-        # Create the Application and pass it your bot's token
-        application = Application.builder().token(token).build()
+        # Create the Application and pass it your bot's token. Outgoing requests are
+        # throttled to Telegram's flood limits (30/s overall, 20/min per group, short
+        # bursts per private chat) and requests answered with a 429 are retried after
+        # the advised delay.
+        # Messages default to HTML and handlers run as concurrent tasks, with
+        # enough pooled connections that concurrent sends don't queue for one
+        application = (
+            Application.builder()
+            .token(token)
+            .defaults(Defaults(parse_mode=ParseMode.HTML, block=False))
+            .rate_limiter(_ChatRateLimiter(max_retries=3))
+            .request(HTTPXRequest(
+                connection_pool_size=TELEGRAM_POOL_SIZE,
+                pool_timeout=20.0,
+                connect_timeout=5.0,
+                read_timeout=15.0,
+                # Concurrent sends share multiplexed streams instead of queueing for a socket
+                http_version="2"
+            ))
+            .concurrent_updates(TELEGRAM_POOL_SIZE)
+            # Started and stopped together with the application by run_polling
+            .job_queue(JobQueue())
+            .post_init(post_init)
+            .build()
+        )
 
         # Add command handlers
         application.add_handler(CommandHandler("start", start))
@@ -2522,13 +2689,14 @@ def main() -> None:
         # Add error handler
         application.add_error_handler(error_handler)
 
-        # Ensure job queue is initialized
-        if not application.job_queue:
-            logger.warning("Job queue not initialized. Creating job queue...")
-            application.job_queue = JobQueue()
-            application.job_queue.set_application(application)
-            application.job_queue.start()
-            logger.info("Job queue started successfully")
+        # Write queued interactions in batches
+        application.job_queue.run_repeating(flush_interactions_job, interval=INTERACTION_FLUSH_INTERVAL)
+        
+        # Keep the WAL from growing
+        application.job_queue.run_repeating(housekeeping_job, interval=HOUSEKEEPING_INTERVAL, first=10)
+        
+        # Keep the query planner statistics current as the tables grow
+        application.job_queue.run_repeating(optimize_job, interval=OPTIMIZE_INTERVAL)
 
         # Start the Bot
         logger.info("Starting bot...")